@@ -0,0 +1,304 @@
+"""
+Throughput benchmarks of dnpak on synthetic PAKs
+
+Every case runs in a fresh process, so the peak RSS of a case isn't
+inflated by the cases before it. Results are printed as JSON, and can be
+compared against a previous run with --baseline to catch regressions.
+
+    python benchmarks/bench_pak.py --entries 1000 10000 --output result.json
+    python benchmarks/bench_pak.py --baseline result.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Benchmark the working tree rather than an installed release
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import dnpak  # noqa: E402
+
+CASES = ("pack", "read", "read_lazy", "find_file", "extract", "edit")
+
+WORDS = (b"dragon", b"nest", b"resource", b"mapdata", b"skill", b"npc",
+         b"table", b"effect", b"sound", b"ui")
+
+
+def generate_files(folder: str, entries: int, size: int, distribution: str,
+                   compressibility: float, seed: int) -> int:
+    """
+    Write synthetic files into the specified folder
+
+    :param folder: Folder to write the files in
+    :type folder: str
+
+    :param entries: Number of files
+    :type entries: int
+
+    :param size: Mean file size in bytes
+    :type size: int
+
+    :param distribution: 'fixed', 'uniform' (0 to 2 * size) or
+    'lognormal' (many small files and a few big ones)
+    :type distribution: str
+
+    :param compressibility: Fraction of every file that is text,
+    the rest is random bytes
+    :type compressibility: float
+
+    :param seed: Seed of the generator, the same seed writes the same files
+    :type seed: int
+
+    :return: Total size of the files in bytes
+    :rtype: int
+    """
+
+    rng = random.Random(seed)
+    total = 0
+    for i in range(entries):
+        if distribution == "fixed":
+            file_size = size
+        elif distribution == "uniform":
+            file_size = rng.randint(0, 2 * size)
+        else:
+            # sigma 1 has a mean of exp(mu + 0.5)
+            file_size = int(rng.lognormvariate(0, 1) * size / 1.6487)
+
+        text_size = int(file_size * compressibility)
+        text = b" ".join(rng.choice(WORDS) for _ in range(text_size // 5 + 1))
+        noise_size = file_size - text_size
+        noise = rng.getrandbits(noise_size * 8).to_bytes(noise_size, "little")
+
+        # Spread over folders, like the game resources
+        path = os.path.join(folder, f"folder{i % 64:02}", f"file{i:06}.dat")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            handle.write(text[:text_size] + noise)
+        total += file_size
+
+    return total
+
+
+def pack(folder: str, file_name: str, workers: int):
+    pak = dnpak.EtFileSystem.write(file_name)
+    pak.add_files(folder, workers=workers)
+    pak.close_file_system()
+
+
+def peak_rss() -> Optional[int]:
+    """
+    :return: Peak resident set size of this process in bytes, None if
+    it can't be measured on this platform
+    :rtype: Optional[int]
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case: str, folder: str, pak_name: str, repeat: int,
+             workers: int) -> Dict:
+    """
+    Time a case, only the measured call is inside the timer
+
+    :return: Timings of every repeat and the peak RSS
+    :rtype: Dict
+    """
+
+    work = tempfile.mkdtemp(prefix="dnpak-bench-")
+    timings: List[float] = []
+    try:
+        for i in range(repeat):
+            if case == "pack":
+                start = time.perf_counter()
+                pack(folder, os.path.join(work, f"{i}.pak"), workers)
+                timings.append(time.perf_counter() - start)
+
+            elif case in ("read", "read_lazy"):
+                start = time.perf_counter()
+                pak = dnpak.EtFileSystem.read(pak_name,
+                                              lazy=case == "read_lazy")
+                timings.append(time.perf_counter() - start)
+                pak.close_file_system()
+
+            elif case == "find_file":
+                pak = dnpak.EtFileSystem.read(pak_name, lazy=True)
+                locations = [file.get_location() for file in pak.get_files()]
+                # Includes building the index on the first call
+                start = time.perf_counter()
+                for location in locations:
+                    pak.find_file(location)
+                timings.append(time.perf_counter() - start)
+                pak.close_file_system()
+
+            elif case == "extract":
+                directory = os.path.join(work, str(i))
+                pak = dnpak.EtFileSystem.read(pak_name, lazy=True)
+                start = time.perf_counter()
+                pak.extract(directory=directory, workers=workers)
+                timings.append(time.perf_counter() - start)
+                pak.close_file_system()
+                shutil.rmtree(directory)
+
+            elif case == "edit":
+                copy = shutil.copy(pak_name, os.path.join(work, f"{i}.pak"))
+                pak = dnpak.EtFileSystem.read(copy)
+                files = pak.get_files()[::10]
+                start = time.perf_counter()
+                for file in files:
+                    pak.edit_file(file, b"edited " * 100)
+                pak.close_file_system()
+                timings.append(time.perf_counter() - start)
+
+            else:
+                raise ValueError(f"Unknown case {case}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    return {"timings": timings, "peak_rss": peak_rss()}
+
+
+def run_isolated(*args) -> Dict:
+    """
+    Run a case in a fresh process
+    """
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_case, args)
+
+
+def benchmark(entries: int, args) -> List[Dict]:
+    """
+    Benchmark every case on a PAK with the specified number of entries
+    """
+
+    work = tempfile.mkdtemp(prefix="dnpak-bench-")
+    try:
+        folder = os.path.join(work, "files")
+        total = generate_files(folder, entries, args.size, args.distribution,
+                               args.compressibility, args.seed)
+        pak_name = os.path.join(work, "source.pak")
+        pack(folder, pak_name, args.workers)
+
+        results = []
+        for case in args.cases:
+            result = run_isolated(case, folder, pak_name, args.repeat,
+                                  args.workers)
+            best = min(result["timings"])
+            # edit only touches every tenth entry
+            count = len(range(0, entries, 10)) if case == "edit" else entries
+            results.append({
+                "case": case,
+                "entries": entries,
+                "total_bytes": total,
+                "best_seconds": best,
+                "median_seconds": statistics.median(result["timings"]),
+                "entries_per_second": count / best if best else None,
+                "mb_per_second": (None if case in ("find_file", "edit")
+                                  or not best else total / best / 1024 ** 2),
+                "peak_rss": result["peak_rss"],
+            })
+            print(f"{case:>10} {entries:>8} entries "
+                  f"{best * 1000:10.1f} ms", file=sys.stderr)
+        return results
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def compare(results: List[Dict], baseline_name: str,
+            threshold: float) -> List[str]:
+    """
+    :return: Cases that are slower than the baseline by more than
+    the threshold
+    :rtype: List[str]
+    """
+
+    with open(baseline_name) as handle:
+        baseline = {(result["case"], result["entries"]): result
+                    for result in json.load(handle)["results"]}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["case"], result["entries"]))
+        if previous is None:
+            continue
+
+        ratio = result["best_seconds"] / previous["best_seconds"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{result['case']} ({result['entries']} entries) "
+                f"is {ratio:.2f}x slower")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000],
+                        help="entry counts of the synthetic PAKs")
+    parser.add_argument("--size", type=int, default=16 * 1024,
+                        help="mean file size in bytes")
+    parser.add_argument("--distribution", default="lognormal",
+                        choices=("fixed", "uniform", "lognormal"))
+    parser.add_argument("--compressibility", type=float, default=0.8,
+                        help="fraction of every file that is text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="workers of add_files and extract")
+    parser.add_argument("--cases", nargs="+", default=list(CASES),
+                        choices=CASES)
+    parser.add_argument("--output", help="write the JSON here, not stdout")
+    parser.add_argument("--baseline",
+                        help="JSON of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown over the baseline that fails the run")
+    args = parser.parse_args(argv)
+
+    results = []
+    for entries in args.entries:
+        results.extend(benchmark(entries, args))
+
+    report = json.dumps({
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "baseline", "threshold")
+        },
+        "results": results,
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,9 @@ setup(
     keywords=["dragonnest"],
     packages=["dnpak"],
     package_dir={"": "src"},
+    entry_points={
+        "console_scripts": ["dnpak = dnpak.cli:main"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
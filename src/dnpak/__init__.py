@@ -1,2 +1,51 @@
-from .etfile import EtFile
-from .etfilesystem import EtFileSystem
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .async_etfilesystem import AsyncEtFileSystem
+    from .cache import CompressionCache
+    from .compression import CompressionPolicy
+    from .etfile import EtFile
+    from .etfilesystem import EtFileSystem
+    from .index import PakIndex
+    from .metrics import Metrics
+    from .patch import apply_patch, create_patch, diff_paks
+    from .vfs import PakVFS
+
+# Imported on first use, so the command-line tool doesn't pay for
+# asyncio and the executors when it doesn't need them
+_EXPORTS = {
+    "AsyncEtFileSystem": ".async_etfilesystem",
+    "CompressionCache": ".cache",
+    "CompressionPolicy": ".compression",
+    "EtFile": ".etfile",
+    "EtFileSystem": ".etfilesystem",
+    "PakIndex": ".index",
+    "Metrics": ".metrics",
+    "apply_patch": ".patch",
+    "create_patch": ".patch",
+    "diff_paks": ".patch",
+    "PakVFS": ".vfs",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        # Submodules, e.g. dnpak.etfilesystem.EtFileSystem
+        try:
+            return importlib.import_module(f".{name}", __name__)
+        except ModuleNotFoundError as err:
+            if err.name != f"{__name__}.{name}":
+                raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,171 @@
+import asyncio
+import functools
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from .etfile import EtFile
+from .etfilesystem import EtFileSystem
+from .metrics import Metrics
+
+
+class AsyncEtFileSystem:
+    def __init__(self, pak: EtFileSystem, executor: Optional[Executor] = None):
+        """
+        asyncio facade of EtFileSystem, file I/O and zlib run in an
+        executor so the event loop isn't blocked
+
+        :param pak: Opened EtFileSystem
+        :type pak: EtFileSystem
+
+        :param executor: Executor to run blocking calls in, the default
+        executor of the event loop if not specified
+        :type executor: concurrent.futures.Executor
+        """
+
+        self.__pak = pak
+        self.__executor = executor
+
+    def __repr__(self):
+        return repr(self.__pak)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    @classmethod
+    async def read(cls, file_name: str, lazy: bool = True,
+                   use_mmap: bool = False,
+                   executor: Optional[Executor] = None,
+                   metrics: Optional[Metrics] = None):
+        """
+        Read the specified PAK, see EtFileSystem.read
+
+        :param file_name: PAK file name to read
+        :type file_name: str
+
+        :param lazy: Only parse the file information table
+        :type lazy: bool
+
+        :param use_mmap: Memory-map the PAK
+        :type use_mmap: bool
+
+        :param executor: Executor to run blocking calls in
+        :type executor: concurrent.futures.Executor
+
+        :param metrics: Collector of the I/O and decompression metrics
+        :type metrics: Metrics
+        """
+
+        pak = await asyncio.get_running_loop().run_in_executor(
+            executor,
+            functools.partial(EtFileSystem.read, file_name, lazy=lazy,
+                              use_mmap=use_mmap, metrics=metrics))
+        return cls(pak, executor)
+
+    def get_file_system(self) -> EtFileSystem:
+        """
+        A getter for the wrapped EtFileSystem
+
+        :rtype: EtFileSystem
+        """
+
+        return self.__pak
+
+    async def read_entry(self, location: str, ignore_case: bool = False) -> bytes:
+        """
+        Decompressed data of the file at the specified location
+
+        :param location: Location of the file in pak
+        :type location: str
+
+        :param ignore_case: Match the location case-insensitively
+        :type ignore_case: bool
+
+        :rtype: bytes
+        """
+
+        def read_entry():
+            file = self.__pak.find_file(location, ignore_case=ignore_case)
+            return self.__pak.get_decompressed_data(file)
+
+        return await self.__run(read_entry)
+
+    async def iter_entries(
+            self, prefetch: int = 4) -> AsyncIterator[Tuple[EtFile, bytes]]:
+        """
+        Iterate over the files with their decompressed data, in
+        table order. The data goes through the metrics and the cache
+        of the PAK, like read_entry
+
+        :param prefetch: Number of files decompressed ahead
+        :type prefetch: int
+
+        :return: EtFile objects with their decompressed data
+        :rtype: AsyncIterator[Tuple[EtFile, bytes]]
+        """
+
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        try:
+            for file in list(self.__pak.get_files()):
+                pending.append((file,
+                                loop.run_in_executor(
+                                    self.__executor,
+                                    self.__pak.get_decompressed_data,
+                                    file)))
+                if len(pending) > prefetch:
+                    file, future = pending.popleft()
+                    yield file, await future
+
+            while pending:
+                file, future = pending.popleft()
+                yield file, await future
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def __aiter__(self):
+        return self.iter_entries()
+
+    async def extract(self, mode=None, directory=None, limit: int = 4,
+                      **filters) -> Dict[str, Exception]:
+        """
+        Extract compressed data inside PAK, see EtFileSystem.extract
+
+        :param mode: Use 'strict' mode to prevent extracting 0 byte files
+        :type mode: str
+
+        :param directory: Specified directory name for the extracted files
+        :type directory: str
+
+        :param limit: Number of files extracted concurrently
+        :type limit: int
+
+        :param filters: include, exclude, predicate and ignore_case,
+        see EtFileSystem.extract
+
+        :return: Errors of the files that couldn't be extracted,
+        keyed by location
+        :rtype: Dict[str, Exception]
+        """
+
+        return await self.__run(self.__pak.extract, mode, directory,
+                                workers=limit, **filters)
+
+    async def close(self):
+        """
+        Close the PAK, see EtFileSystem.close_file_system
+        """
+
+        await self.__run(self.__pak.close_file_system)
+
+    async def __run(self, func, *args, **kwargs):
+        """
+        Run a blocking call in the executor
+        """
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.__executor, functools.partial(func, *args, **kwargs))
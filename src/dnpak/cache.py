@@ -0,0 +1,268 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+class CompressionCache:
+    def __init__(self, directory: str, max_size: int = 1024 ** 3):
+        """
+        On-disk cache of compressed data, keyed by source file path,
+        size, modification time and compression level. The least
+        recently used entries are evicted past max_size
+
+        :param directory: Directory to keep the cache in
+        :type directory: str
+
+        :param max_size: Maximum total size of the cache in bytes
+        :type max_size: int
+        """
+
+        self.__directory = directory
+        self.__max_size = max_size
+        self.__lock = threading.Lock()
+
+        # Cache file path -> size, least recently used first
+        self.__entries: "OrderedDict[str, int]" = OrderedDict()
+        self.__size = 0
+
+        # The modification time of a cache file is its last use
+        os.makedirs(directory, exist_ok=True)
+        entries = [
+            entry for entry in os.scandir(directory)
+            if entry.is_file() and not entry.name.startswith(".")
+        ]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            self.__entries[entry.path] = entry.stat().st_size
+            self.__size += entry.stat().st_size
+
+    def __repr__(self):
+        return str({
+            "directory": self.__directory,
+            "entries": len(self.__entries),
+            "size": self.__size,
+            "max_size": self.__max_size,
+        })
+
+    def get(self, file_name: str, level: Hashable = 1) -> Optional[bytes]:
+        """
+        Get the cached compressed data of the specified file
+
+        :param file_name: Path of the source file
+        :type file_name: str
+
+        :param level: Compression level the data was compressed with,
+        or a key of the compression settings
+        :type level: Hashable
+
+        :return: Compressed data, or None if it isn't cached
+        :rtype: Optional[bytes]
+        """
+
+        path = self.__path(file_name, level)
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return None
+
+        with self.__lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted in the meantime
+                return data
+
+            self.__size += len(data) - self.__entries.pop(path, 0)
+            self.__entries[path] = len(data)
+
+        return data
+
+    def put(self, file_name: str, filedatacomp: bytes, level: Hashable = 1):
+        """
+        Cache the compressed data of the specified file
+
+        :param file_name: Path of the source file
+        :type file_name: str
+
+        :param filedatacomp: zlib compressed data
+        :type filedatacomp: bytes
+
+        :param level: Compression level the data was compressed with,
+        or a key of the compression settings
+        :type level: Hashable
+        """
+
+        path = self.__path(file_name, level)
+
+        # Written to a temporary file first, so a reader never sees
+        # half of the data
+        descriptor, temporary = tempfile.mkstemp(prefix=".",
+                                                 dir=self.__directory)
+        with os.fdopen(descriptor, "wb") as handle:
+            handle.write(filedatacomp)
+        os.replace(temporary, path)
+
+        with self.__lock:
+            self.__size += len(filedatacomp) - self.__entries.pop(path, 0)
+            self.__entries[path] = len(filedatacomp)
+            self.__evict()
+
+    def clear(self):
+        """
+        Remove every entry from the cache
+        """
+
+        with self.__lock:
+            for path in self.__entries:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self.__entries.clear()
+            self.__size = 0
+
+    def __evict(self):
+        """
+        Remove the least recently used entries until the cache
+        fits in max_size
+        """
+
+        while self.__size > self.__max_size and self.__entries:
+            path, size = self.__entries.popitem(last=False)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.__size -= size
+
+    def __path(self, file_name: str, level: Hashable) -> str:
+        """
+        Cache file path of the specified file
+
+        :param file_name: Path of the source file
+        :type file_name: str
+
+        :param level: Compression level, or a key of the compression settings
+        :type level: Hashable
+
+        :rtype: str
+        """
+
+        stat = os.stat(file_name)
+        key = (f"{os.path.abspath(file_name)}\0{stat.st_size}\0"
+               f"{stat.st_mtime_ns}\0{level}")
+
+        return os.path.join(self.__directory,
+                            hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+
+class DecompressedCache:
+    def __init__(self, max_size: int):
+        """
+        In-memory LRU cache of decompressed data, bounded by the total
+        size of the data rather than the number of entries
+
+        :param max_size: Maximum total size of the cached data in bytes
+        :type max_size: int
+        """
+
+        self.__max_size = max_size
+        self.__lock = threading.Lock()
+        self.__entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self.__size = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __repr__(self):
+        return str(self.get_stats())
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """
+        :param key: Key of the data, usually an EtFile object
+        :type key: Hashable
+
+        :return: Cached data, or None if it isn't cached
+        :rtype: Optional[bytes]
+        """
+
+        with self.__lock:
+            data = self.__entries.get(key)
+            if data is None:
+                self.__misses += 1
+                return None
+
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+            return data
+
+    def put(self, key: Hashable, data: bytes):
+        """
+        Cache the data, data bigger than max_size isn't cached
+
+        :param key: Key of the data, usually an EtFile object
+        :type key: Hashable
+
+        :param data: Decompressed data
+        :type data: bytes
+        """
+
+        if len(data) > self.__max_size:
+            return
+
+        with self.__lock:
+            previous = self.__entries.pop(key, None)
+            if previous is not None:
+                self.__size -= len(previous)
+
+            self.__entries[key] = data
+            self.__size += len(data)
+
+            while self.__size > self.__max_size:
+                _, evicted = self.__entries.popitem(last=False)
+                self.__size -= len(evicted)
+                self.__evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """
+        Remove the data of the specified key
+
+        :param key: Key of the data, usually an EtFile object
+        :type key: Hashable
+        """
+
+        with self.__lock:
+            data = self.__entries.pop(key, None)
+            if data is not None:
+                self.__size -= len(data)
+
+    def clear(self):
+        """
+        Remove every entry from the cache
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        :return: hits, misses, evictions, entries, size and max_size
+        :rtype: Dict[str, int]
+        """
+
+        with self.__lock:
+            return {
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "evictions": self.__evictions,
+                "entries": len(self.__entries),
+                "size": self.__size,
+                "max_size": self.__max_size,
+            }
@@ -0,0 +1,298 @@
+"""
+dnpak command-line tool
+
+The package modules are imported by the subcommands that use them,
+so the tool starts fast
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+
+    try:
+        return args.func(args)
+    except (FileExistsError, FileNotFoundError, NameError, ValueError) as err:
+        print(f"dnpak: {err}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader of stdout went away, e.g. dnpak cat ... | head. The
+        # rest of the output goes nowhere, so flushing it at exit
+        # doesn't fail again
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="dnpak", description="Manipulate Dragon Nest PAK files")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    def add(name: str, func, help: str) -> argparse.ArgumentParser:
+        command = commands.add_parser(name, help=help, description=help)
+        command.set_defaults(func=func)
+        return command
+
+    def add_jobs(command: argparse.ArgumentParser):
+        command.add_argument("-j", "--jobs", type=int, default=1,
+                             help="number of files processed concurrently")
+
+    def add_filters(command: argparse.ArgumentParser):
+        command.add_argument("-i", "--include", action="append",
+                             help="only files matching this glob pattern, "
+                                  "can be repeated")
+        command.add_argument("-x", "--exclude", action="append",
+                             help="skip files matching this glob pattern, "
+                                  "can be repeated")
+        command.add_argument("--ignore-case", action="store_true",
+                             help="match the patterns case-insensitively")
+
+    def add_progress(command: argparse.ArgumentParser):
+        command.add_argument("-p", "--progress", action="store_true",
+                             help="show the progress on stderr")
+        command.add_argument("-q", "--quiet", action="store_true",
+                             help="don't print the summary on stderr")
+
+    command = add("pack", _pack, "pack the files of a folder into a new PAK")
+    command.add_argument("folder")
+    command.add_argument("pak")
+    command.add_argument("-l", "--level", type=int, default=1,
+                         help="zlib compression level, 1 by default")
+    command.add_argument("--store-incompressible", action="store_true",
+                         help="store audio, images and archives "
+                              "without compressing them")
+    command.add_argument("--streaming", action="store_true",
+                         help="compress files straight into the PAK")
+    command.add_argument("--dedup", action="store_true",
+                         help="store files with identical content once")
+    add_jobs(command)
+    add_progress(command)
+
+    command = add("unpack", _unpack, "extract the files of a PAK")
+    command.add_argument("pak")
+    command.add_argument("-o", "--output",
+                         help="directory to extract to, the PAK file name "
+                              "without .pak by default")
+    command.add_argument("--strict", action="store_true",
+                         help="skip empty files")
+    add_jobs(command)
+    add_filters(command)
+    add_progress(command)
+
+    command = add("ls", _ls, "list the files of a PAK")
+    command.add_argument("pak")
+    command.add_argument("-l", "--long", action="store_true",
+                         help="also show the size, compressed size and offset")
+    add_filters(command)
+
+    command = add("cat", _cat, "write the data of a file to stdout")
+    command.add_argument("pak")
+    command.add_argument("location")
+    command.add_argument("--ignore-case", action="store_true",
+                         help="match the location case-insensitively")
+
+    command = add("verify", _verify, "check the files of PAKs "
+                                     "against their checksums")
+    command.add_argument("paks", nargs="+", metavar="pak")
+    add_jobs(command)
+    add_progress(command)
+
+    command = add("diff", _diff, "show the files that are added (A), "
+                                 "changed (M) and removed (D) in a new PAK")
+    command.add_argument("old")
+    command.add_argument("new")
+    command.add_argument("--patch",
+                         help="also write a patch PAK with the changes")
+
+    return parser
+
+
+def _pack(args) -> int:
+    from .compression import CompressionPolicy
+    from .etfilesystem import EtFileSystem
+    from .metrics import BYTES_READ, ENTRIES_ADDED, Metrics
+
+    policy = None
+    if args.store_incompressible:
+        policy = CompressionPolicy.store_incompressible(level=args.level)
+    elif args.level != 1:
+        policy = CompressionPolicy(level=args.level)
+
+    # Before the PAK is created, so nothing is left behind
+    if not os.path.isdir(args.folder):
+        raise FileNotFoundError(f"{args.folder} isn't a folder")
+
+    metrics = Metrics()
+    start = time.perf_counter()
+    pak = EtFileSystem.write(args.pak, streaming=args.streaming,
+                             dedup=args.dedup, policy=policy, metrics=metrics)
+    try:
+        pak.add_files(args.folder, workers=args.jobs,
+                      progress=_progress(args))
+        pak.close_file_system()
+    except BaseException:
+        # Also on Ctrl+C, a partial PAK would block running it again
+        pak.discard_file_system()
+        raise
+
+    stats = metrics.get_stats()
+    _summary(args, "packed", stats.get(ENTRIES_ADDED, 0),
+             stats.get(BYTES_READ, 0), start)
+    return 0
+
+
+def _unpack(args) -> int:
+    from .etfilesystem import EtFileSystem
+    from .metrics import BYTES_WRITTEN, ENTRIES_EXTRACTED, Metrics
+
+    metrics = Metrics()
+    start = time.perf_counter()
+    pak = EtFileSystem.read(args.pak, lazy=True, metrics=metrics)
+    try:
+        errors = pak.extract("strict" if args.strict else None, args.output,
+                             workers=args.jobs, progress=_progress(args),
+                             include=args.include, exclude=args.exclude,
+                             ignore_case=args.ignore_case)
+    finally:
+        pak.close_file_system()
+
+    for location, err in errors.items():
+        print(f"dnpak: {location}: {err}", file=sys.stderr)
+
+    stats = metrics.get_stats()
+    _summary(args, "extracted", stats.get(ENTRIES_EXTRACTED, 0),
+             stats.get(BYTES_WRITTEN, 0), start)
+    return 1 if errors else 0
+
+
+def _ls(args) -> int:
+    from .etfilesystem import EtFileSystem
+    from . import utils
+
+    included = (utils.location_filter(args.include, args.ignore_case)
+                if args.include else None)
+    excluded = (utils.location_filter(args.exclude, args.ignore_case)
+                if args.exclude else None)
+
+    pak = EtFileSystem.read(args.pak, lazy=True)
+    try:
+        lines = []
+        for file in pak.get_files():
+            key = utils.normalize_location(file.get_location())
+            if included is not None and not included(key):
+                continue
+            if excluded is not None and excluded(key):
+                continue
+
+            if args.long:
+                lines.append(f"{file.get_file_size():>12} "
+                             f"{file.get_compressed_file_size():>12} "
+                             f"{file.get_offset():>12} {file.get_location()}")
+            else:
+                lines.append(file.get_location())
+    finally:
+        pak.close_file_system()
+
+    if lines:
+        print("\n".join(lines))
+    return 0
+
+
+def _cat(args) -> int:
+    from .etfilesystem import EtFileSystem
+
+    pak = EtFileSystem.read(args.pak, lazy=True)
+    try:
+        file = pak.find_file(args.location, ignore_case=args.ignore_case)
+        out = sys.stdout.buffer
+        for chunk in file.iter_chunks():
+            out.write(chunk)
+        out.flush()
+    finally:
+        pak.close_file_system()
+
+    return 0
+
+
+def _verify(args) -> int:
+    from .etfilesystem import EtFileSystem
+    from .metrics import BYTES_READ, Metrics
+
+    metrics = Metrics()
+    start = time.perf_counter()
+    count = 0
+    corrupt = 0
+    for file_name in args.paks:
+        pak = EtFileSystem.read(file_name, use_mmap=True, metrics=metrics)
+        try:
+            errors = pak.verify(workers=args.jobs, progress=_progress(args))
+            count += len(pak.get_files())
+        finally:
+            pak.close_file_system()
+
+        for location, err in errors.items():
+            print(f"dnpak: {file_name}: {location}: {err}", file=sys.stderr)
+        corrupt += len(errors)
+
+    _summary(args, "verified", count, metrics.get_stats().get(BYTES_READ, 0),
+             start, f", {corrupt} corrupt")
+    return 1 if corrupt else 0
+
+
+def _diff(args) -> int:
+    from .patch import create_patch, diff_paks
+
+    if args.patch is not None:
+        changes = create_patch(args.old, args.new, args.patch)
+    else:
+        changes = diff_paks(args.old, args.new)
+
+    lines = [f"{status} {location}"
+             for status, key in (("A", "added"), ("M", "changed"),
+                                 ("D", "removed"))
+             for location in changes[key]]
+    if lines:
+        print("\n".join(lines))
+    return 0
+
+
+def _progress(args):
+    """
+    Progress callback that rewrites one line of stderr, or None
+    """
+
+    if not args.progress:
+        return None
+
+    def progress(done: int, total: int, location: str):
+        end = "\n" if done == total else ""
+        print(f"\r\033[K{done}/{total} {location}", end=end, file=sys.stderr,
+              flush=True)
+
+    return progress
+
+
+def _summary(args, action: str, count: int, size: float, start: float,
+             extra: str = ""):
+    """
+    Print the number of files, their size and the throughput to stderr
+    """
+
+    if args.quiet:
+        return
+
+    seconds = time.perf_counter() - start
+    megabytes = size / 1024 ** 2
+    throughput = megabytes / seconds if seconds else 0.0
+    print(f"{action} {count} files, {megabytes:.1f} MB in {seconds:.2f} s "
+          f"({throughput:.1f} MB/s){extra}", file=sys.stderr)
@@ -0,0 +1,147 @@
+import zlib
+from fnmatch import fnmatchcase
+from typing import Dict, Optional, Tuple
+
+from . import utils
+
+# Level 0 still writes a zlib stream, with stored blocks
+STORE = 0
+
+# Formats that are compressed already. DDS isn't one of them, block
+# compressed textures still get noticeably smaller with zlib and
+# uncompressed ones a lot, so they're left to the sample_size trial
+INCOMPRESSIBLE_PATTERNS = ("*.ogg", "*.mp3", "*.jpg", "*.jpeg", "*.png",
+                           "*.zip", "*.gz")
+
+
+class CompressionPolicy:
+    def __init__(self, level: int = 1,
+                 strategy: int = zlib.Z_DEFAULT_STRATEGY,
+                 patterns: Optional[Dict[str, Tuple[int, int]]] = None,
+                 sample_size: int = 0, store_ratio: float = 0.95):
+        """
+        Choose the zlib level and strategy of every file
+
+        :param level: Level of the files no pattern matches
+        :type level: int
+
+        :param strategy: Strategy of the files no pattern matches
+        :type strategy: int
+
+        :param patterns: Glob patterns of locations, matched
+        case-insensitively, to (level, strategy). The first match wins
+        :type patterns: Dict[str, Tuple[int, int]]
+
+        :param sample_size: Compress the first sample_size bytes of a
+        file to try it, 0 to not try
+        :type sample_size: int
+
+        :param store_ratio: Store the file without compressing it if the
+        sample doesn't get smaller than this ratio
+        :type store_ratio: float
+        """
+
+        self.__level = level
+        self.__strategy = strategy
+        self.__patterns = [(utils.normalize_location(pattern).casefold(), rule)
+                           for pattern, rule in (patterns or {}).items()]
+        self.__sample_size = sample_size
+        self.__store_ratio = store_ratio
+
+    def __repr__(self):
+        return str({
+            "level": self.__level,
+            "strategy": self.__strategy,
+            "patterns": dict(self.__patterns),
+            "sample_size": self.__sample_size,
+            "store_ratio": self.__store_ratio,
+        })
+
+    @classmethod
+    def store_incompressible(cls, level: int = 1, **kwargs):
+        """
+        Policy that stores formats that are compressed already and
+        compresses everything else with the specified level. DDS
+        textures are compressed, pass sample_size to store the ones
+        that don't get smaller
+
+        :param level: Level of the other files
+        :type level: int
+        """
+
+        patterns = {pattern: (STORE, zlib.Z_DEFAULT_STRATEGY)
+                    for pattern in INCOMPRESSIBLE_PATTERNS}
+        patterns.update(kwargs.pop("patterns", None) or {})
+        return cls(level, patterns=patterns, **kwargs)
+
+    def get_key(self) -> str:
+        """
+        Identify the compression settings, e.g. for CompressionCache
+
+        :rtype: str
+        """
+
+        return repr(self)
+
+    def choose(self, location: str, sample: bytes = b"") -> Tuple[int, int]:
+        """
+        Choose the level and strategy of a file
+
+        :param location: Location of the file inside pak
+        :type location: str
+
+        :param sample: Beginning of the file data
+        :type sample: bytes
+
+        :return: zlib level and strategy
+        :rtype: Tuple[int, int]
+        """
+
+        key = utils.normalize_location(location).casefold()
+        level, strategy = self.__level, self.__strategy
+        for pattern, rule in self.__patterns:
+            if fnmatchcase(key, pattern):
+                level, strategy = rule
+                break
+
+        if level != STORE and self.__sample_size and sample:
+            sample = sample[:self.__sample_size]
+            compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS,
+                                          zlib.DEF_MEM_LEVEL, strategy)
+            size = len(compressor.compress(sample)) + len(compressor.flush())
+            if size >= len(sample) * self.__store_ratio:
+                return STORE, zlib.Z_DEFAULT_STRATEGY
+
+        return level, strategy
+
+    def compressobj(self, location: str, sample: bytes = b""):
+        """
+        zlib compress object for a file
+
+        :param location: Location of the file inside pak
+        :type location: str
+
+        :param sample: Beginning of the file data
+        :type sample: bytes
+        """
+
+        level, strategy = self.choose(location, sample)
+        return zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS,
+                                zlib.DEF_MEM_LEVEL, strategy)
+
+    def compress(self, data: bytes, location: str) -> bytes:
+        """
+        Compress the data of a file
+
+        :param data: File data
+        :type data: bytes
+
+        :param location: Location of the file inside pak
+        :type location: str
+
+        :return: zlib compressed data
+        :rtype: bytes
+        """
+
+        compressor = self.compressobj(location, data[:self.__sample_size])
+        return compressor.compress(data) + compressor.flush()
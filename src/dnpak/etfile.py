@@ -1,21 +1,30 @@
 import binascii
+import io
+import mmap
 import os
 import struct
 import zlib
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
 
+from .metrics import (BYTES_READ, COMPRESS_SECONDS, DECOMPRESS_SECONDS,
+                      READ_SECONDS, SEEKS, Metrics, count, measure)
 
-class EtFile:
-    __location: str = ""
-    __filedata: bytes = b""
-    __filedatacomp: bytes = b""
-    __filesize: int = 0
-    __filesizecomp: int = 0
-    __offset: int = 0
-    __alloc_size: int = 0
+if TYPE_CHECKING:
+    from .compression import CompressionPolicy
+
+CHUNK_SIZE = 1024 * 1024
 
-    def __init__(self, file_name: Optional[str] = None, location: Optional[str] = None):
+
+class EtFile:
+    # No per-instance dict, paks can have hundreds of thousands of files
+    __slots__ = ("__location", "__filedatacomp", "__filesize",
+                 "__filesizecomp", "__offset", "__alloc_size", "__source",
+                 "__source_lock", "__dirty", "__checksum")
+
+    def __init__(self, file_name: Optional[str] = None, location: Optional[str] = None,
+                 policy: Optional["CompressionPolicy"] = None,
+                 metrics: Optional[Metrics] = None):
         """
         Initialize file inside pak
 
@@ -24,26 +33,57 @@ class EtFile:
 
         :param location: Location of file inside pak
         :type location: str
+
+        :param policy: Compression policy, level 1 if not specified
+        :type policy: CompressionPolicy
+
+        :param metrics: Collector of the read and compression metrics
+        :type metrics: Metrics
         """
 
+        self.__location = ""
+        self.__filedatacomp = b""
+        self.__filesize = 0
+        self.__filesizecomp = 0
+        self.__offset = 0
+        self.__alloc_size = 0
+        self.__source = None
+        self.__source_lock = None
+        self.__dirty = False
+        self.__checksum = 0
+
         if file_name is not None:
             try:
                 self.__filesize = os.stat(file_name).st_size
 
-                with open(file_name, "rb") as handle:
-                    self.__filedata = handle.read(self.__filesize)
+                with measure(metrics, READ_SECONDS), \
+                        open(file_name, "rb") as handle:
+                    filedata = handle.read(self.__filesize)
+                count(metrics, BYTES_READ, len(filedata))
             except FileNotFoundError:
                 raise FileNotFoundError
 
+            # Only the compressed data is kept, the raw data is
+            # decompressed again when it's needed
             try:
-                self.__filedatacomp = zlib.compress(self.__filedata, 1)
+                with measure(metrics, COMPRESS_SECONDS):
+                    if policy is not None:
+                        self.__filedatacomp = policy.compress(filedata,
+                                                              str(location))
+                    else:
+                        self.__filedatacomp = zlib.compress(filedata, 1)
             except zlib.error as err:
                 raise err
 
             self.__filesizecomp = len(binascii.hexlify(
                 self.__filedatacomp)) // 2
+            self.__checksum = zlib.crc32(self.__filedatacomp)
 
-        self.__location = str(Path(str(location)))
+            # Not written to a pak yet
+            self.__dirty = True
+
+        if location is not None:
+            self.__location = str(Path(location))
 
     def __repr__(self):
         return f"'{self.__location}'"
@@ -60,7 +100,8 @@ class EtFile:
 
     def set_file_info(self, filesizecomp: int = None, filesize: int = None,
                       alloc_size: int = None, offset: int = None,
-                      filedatacomp: bytes = None):
+                      filedatacomp: bytes = None, dirty: bool = None,
+                      location: str = None, checksum: int = None):
         """
         Set file info
 
@@ -78,6 +119,16 @@ class EtFile:
 
         :param filedatacomp: zlib compressed data
         :type filedatacomp: bytes
+
+        :param dirty: Whether the compressed data differs from
+        what is stored at offset in the pak
+        :type dirty: bool
+
+        :param location: Location of file inside pak, taken as it is
+        :type location: str
+
+        :param checksum: CRC32 of the compressed data, 0 if unknown
+        :type checksum: int
         """
 
         self.__filesizecomp = filesizecomp if filesizecomp is not None else self.__filesizecomp
@@ -85,6 +136,24 @@ class EtFile:
         self.__alloc_size = alloc_size if alloc_size is not None else self.__alloc_size
         self.__offset = offset if offset is not None else self.__offset
         self.__filedatacomp = filedatacomp if filedatacomp is not None else self.__filedatacomp
+        self.__dirty = dirty if dirty is not None else self.__dirty
+        self.__location = location if location is not None else self.__location
+        self.__checksum = checksum if checksum is not None else self.__checksum
+
+    def set_source(self, source, lock=None):
+        """
+        Set the PAK handle the compressed data is read from on demand
+
+        :param source: Binary file object or memory map of the PAK
+        this file belongs to
+        :type source: BinaryIO or mmap.mmap
+
+        :param lock: Lock guarding seek and read on the shared handle
+        :type lock: threading.Lock
+        """
+
+        self.__source = source
+        self.__source_lock = lock
 
     def get_location(self) -> str:
         """
@@ -116,19 +185,225 @@ class EtFile:
 
         return self.__filesizecomp
 
-    def get_decompressed_data(self) -> bytes:
+    def get_offset(self) -> int:
+        """
+        A getter for offset
+
+        :return: A pointer to the location of compressed data
+        :rtype: int
+        """
+
+        return self.__offset
+
+    def get_alloc_size(self) -> int:
+        """
+        A getter for allocation size
+
+        :return: Allocation size of compressed data
+        :rtype: int
+        """
+
+        return self.__alloc_size
+
+    def get_checksum(self) -> int:
+        """
+        A getter for checksum
+
+        :return: CRC32 of the compressed data, 0 if unknown
+        :rtype: int
+        """
+
+        return self.__checksum
+
+    def verify(self, chunk_size: int = CHUNK_SIZE,
+               metrics: Optional[Metrics] = None, filedatacomp=None):
+        """
+        Check the compressed data against the checksum, reading it in
+        chunks. Without a checksum, the data is decompressed instead
+
+        :param chunk_size: Maximum size of a chunk
+        :type chunk_size: int
+
+        :param metrics: Collector of the read and decompression metrics
+        :type metrics: Metrics
+
+        :param filedatacomp: Compressed data that is already read from
+        the PAK, it's read in chunks if not specified
+        :type filedatacomp: bytes or memoryview
+
+        :raises ValueError: The data doesn't match the checksum or size
+        :raises zlib.error: The data can't be decompressed
+        """
+
+        # Empty entries without data, see EtFileSystem.extract strict
+        if self.__filesize == 0 and self.__filesizecomp == 0:
+            return
+
+        if filedatacomp is not None:
+            chunks = [filedatacomp]
+        else:
+            chunks = self.__iter_compressed(chunk_size, metrics)
+
+        if not self.__checksum:
+            filesize = 0
+            for chunk in decompress_chunks(chunks, chunk_size, metrics):
+                filesize += len(chunk)
+            if filesize != self.__filesize:
+                raise ValueError(f"{self.__location} is {filesize} bytes, "
+                                 f"expected {self.__filesize}")
+            return
+
+        # The allocation can be bigger than the compressed data
+        remaining = self.__filesizecomp
+        checksum = 0
+        for chunk in chunks:
+            chunk = chunk[:remaining]
+            checksum = zlib.crc32(chunk, checksum)
+            remaining -= len(chunk)
+            if not remaining:
+                break
+
+        if remaining or checksum != self.__checksum:
+            raise ValueError(f"Checksum mismatch of {self.__location}")
+
+    def is_loaded(self) -> bool:
+        """
+        Whether the compressed data is in memory
+
+        :rtype: bool
+        """
+
+        return bool(self.__filedatacomp)
+
+    def is_dirty(self) -> bool:
+        """
+        Whether the compressed data differs from what is stored
+        at offset in the pak
+
+        :rtype: bool
+        """
+
+        return self.__dirty
+
+    def get_decompressed_data(self, metrics: Optional[Metrics] = None) -> bytes:
         """
         A getter for the decompressed data
 
+        :param metrics: Collector of the read and decompression metrics
+        :type metrics: Metrics
+
         :return: Decompressed data
         :rtype: bytes
         """
 
+        if metrics is not None and not self.__filedatacomp and (
+                self.__source is not None):
+            with metrics.timer(READ_SECONDS):
+                view = self.get_compressed_view()
+            metrics.add(BYTES_READ, len(view))
+            if isinstance(self.__source, io.IOBase):
+                metrics.add(SEEKS)
+        else:
+            view = self.get_compressed_view()
+
+        decompressor = zlib.decompressobj()
         try:
-            return zlib.decompress(self.__filedatacomp)
+            with measure(metrics, DECOMPRESS_SECONDS):
+                data = decompressor.decompress(view)
+                data += decompressor.flush()
         except zlib.error as err:
             raise err
 
+        if not decompressor.eof:
+            raise zlib.error(
+                "Error -5 while decompressing data: incomplete or truncated stream"
+            )
+
+        return data
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE,
+                    metrics: Optional[Metrics] = None) -> Iterator[bytes]:
+        """
+        Decompress the data in chunks, neither the compressed nor the
+        decompressed data is held in memory as a whole
+
+        :param chunk_size: Maximum size of a decompressed chunk
+        :type chunk_size: int
+
+        :param metrics: Collector of the read and decompression metrics
+        :type metrics: Metrics
+
+        :return: Decompressed chunks
+        :rtype: Iterator[bytes]
+        """
+
+        return decompress_chunks(self.__iter_compressed(chunk_size, metrics),
+                                 chunk_size, metrics)
+
+    def open(self, chunk_size: int = CHUNK_SIZE,
+             metrics: Optional[Metrics] = None) -> io.BufferedReader:
+        """
+        Open the decompressed data as a readable binary stream
+
+        :param chunk_size: Maximum size of a decompressed chunk
+        :type chunk_size: int
+
+        :param metrics: Collector of the read and decompression metrics
+        :type metrics: Metrics
+
+        :return: Readable binary stream
+        :rtype: io.BufferedReader
+        """
+
+        return io.BufferedReader(
+            _ChunkReader(self.iter_chunks(chunk_size, metrics)), chunk_size)
+
+    def __iter_compressed(self, chunk_size: int,
+                          metrics: Optional[Metrics]) -> Iterator[bytes]:
+        """
+        Read the compressed data in chunks
+
+        :param chunk_size: Maximum size of a compressed chunk
+        :type chunk_size: int
+
+        :param metrics: Collector of the read metrics
+        :type metrics: Metrics
+
+        :return: Compressed chunks
+        :rtype: Iterator[bytes]
+        """
+
+        if self.__filedatacomp or not isinstance(self.__source, io.IOBase):
+            view = self.get_compressed_view()
+            if not self.__filedatacomp and self.__source is not None:
+                count(metrics, BYTES_READ, len(view))
+            for position in range(0, len(view), chunk_size):
+                yield view[position:position + chunk_size]
+            return
+
+        position = self.__offset
+        end = self.__offset + self.__alloc_size
+        while position < end:
+            with measure(metrics, READ_SECONDS):
+                if self.__source_lock is None:
+                    self.__source.seek(position)
+                    chunk = self.__source.read(min(chunk_size, end - position))
+                else:
+                    with self.__source_lock:
+                        self.__source.seek(position)
+                        chunk = self.__source.read(
+                            min(chunk_size, end - position))
+
+            if metrics is not None:
+                metrics.add(SEEKS)
+                metrics.add(BYTES_READ, len(chunk))
+
+            if not chunk:
+                break
+
+            position += len(chunk)
+            yield chunk
+
     def get_compressed_data(self) -> bytes:
         """
         A getter for the compressed data
@@ -137,8 +412,74 @@ class EtFile:
         :return: Compressed data
         """
 
+        if not self.__filedatacomp and self.__source is not None:
+            return self.__read_source()
+
         return self.__filedatacomp
 
+    def get_compressed_view(self) -> memoryview:
+        """
+        A getter for the compressed data without copying it
+        out of a memory-mapped PAK
+
+        :rtype: memoryview
+        :return: Compressed data
+        """
+
+        if not self.__filedatacomp and isinstance(self.__source, mmap.mmap):
+            return memoryview(self.__source)[self.__offset:self.__offset +
+                                             self.__alloc_size]
+
+        return memoryview(self.get_compressed_data())
+
+    def load(self):
+        """
+        Read the compressed data from the PAK handle into memory
+        """
+
+        if not self.__filedatacomp and self.__source is not None:
+            self.__filedatacomp = self.__read_source()
+
+    def load_from(self, handle, metrics: Optional[Metrics] = None):
+        """
+        Read the compressed data at offset from the specified handle
+
+        :param handle: Binary file object of the PAK
+        :type handle: BinaryIO
+
+        :param metrics: Collector of the read metrics
+        :type metrics: Metrics
+        """
+
+        # seek to offset, and read till allocSize
+        with measure(metrics, READ_SECONDS):
+            handle.seek(self.__offset)
+            self.__filedatacomp = handle.read(self.__alloc_size)
+
+        if metrics is not None:
+            metrics.add(SEEKS)
+            metrics.add(BYTES_READ, len(self.__filedatacomp))
+
+    def __read_source(self) -> bytes:
+        """
+        Read the compressed data at offset from the PAK handle
+
+        :rtype: bytes
+        :return: Compressed data
+        """
+
+        if isinstance(self.__source, mmap.mmap):
+            return self.__source[self.__offset:self.__offset +
+                                 self.__alloc_size]
+
+        if self.__source_lock is None:
+            self.__source.seek(self.__offset)
+            return self.__source.read(self.__alloc_size)
+
+        with self.__source_lock:
+            self.__source.seek(self.__offset)
+            return self.__source.read(self.__alloc_size)
+
     def get_file_info(self) -> bytes:
         """
         Get the file information:
@@ -146,11 +487,11 @@ class EtFile:
         **Location**: Location of file inside pak - FBSTR[256] \n
         **Raw Size**: Size of file after compressed - UINT32 \n
         **Real Size**: Size of file before compressed - UINT32 \n
-        **Compressed Size**: Size of file after compressed
-        (Should be the same as Raw Size) - UINT32 \n
+        **Compressed Size**: Allocation size of compressed data,
+        at least the Raw Size - UINT32 \n
         **Offset**: Pointer to the location of compressed data - UINT32
         **SeedValue**: ? - UINT32 \n
-        **Checksum**: ? - UINT32 \n
+        **Checksum**: CRC32 of the compressed data, 0 if unknown - UINT32 \n
         **cReserved**: ? - 36 bytes
 
         :rtype: bytes
@@ -161,9 +502,80 @@ class EtFile:
         data += struct.pack("<x") * (256 - len(self.__location))
         data += struct.pack("<I", int(self.__filesizecomp))
         data += struct.pack("<I", self.__filesize)
-        data += struct.pack("<I", int(self.__filesizecomp))
+        data += struct.pack("<I", max(self.__alloc_size,
+                                      int(self.__filesizecomp)))
         data += struct.pack("<I", self.__offset)
         data += struct.pack("<I", 0)
-        data += struct.pack("<I", 0)
+        data += struct.pack("<I", self.__checksum)
         data += struct.pack("<x") * 36
         return data
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    Raw binary stream over an iterator of chunks
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self.__chunks = chunks
+        self.__chunk = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.__chunk:
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                return 0
+            self.__chunk = memoryview(chunk)
+
+        size = min(len(buffer), len(self.__chunk))
+        buffer[:size] = self.__chunk[:size]
+        self.__chunk = self.__chunk[size:]
+        return size
+
+
+def decompress_chunks(chunks: Iterable[bytes],
+                      chunk_size: int = CHUNK_SIZE,
+                      metrics: Optional[Metrics] = None) -> Iterator[bytes]:
+    """
+    Decompress zlib compressed chunks into chunks of at most chunk_size
+
+    :param chunks: Compressed chunks
+    :type chunks: Iterable[bytes]
+
+    :param chunk_size: Maximum size of a decompressed chunk
+    :type chunk_size: int
+
+    :param metrics: Collector of the decompression time
+    :type metrics: Metrics
+
+    :return: Decompressed chunks
+    :rtype: Iterator[bytes]
+    """
+
+    decompressor = zlib.decompressobj()
+    for chunk in chunks:
+        with measure(metrics, DECOMPRESS_SECONDS):
+            data = decompressor.decompress(chunk, chunk_size)
+        while True:
+            if data:
+                yield data
+            if not decompressor.unconsumed_tail:
+                break
+            with measure(metrics, DECOMPRESS_SECONDS):
+                data = decompressor.decompress(decompressor.unconsumed_tail,
+                                               chunk_size)
+
+        # The allocation can be bigger than the compressed data
+        if decompressor.eof:
+            break
+
+    data = decompressor.flush()
+    if data:
+        yield data
+
+    if not decompressor.eof:
+        raise zlib.error(
+            "Error -5 while decompressing data: incomplete or truncated stream")
@@ -1,17 +1,39 @@
 import binascii
+import hashlib
+import mmap
 import os
 import struct
+import threading
 import zlib
+from bisect import bisect_left
+from collections import Counter
+from fnmatch import fnmatchcase
 from glob import glob
-from typing import Final, List
-
-from .etfile import EtFile
+from typing import Callable, Dict, Final, List, Optional
+
+from .cache import CompressionCache, DecompressedCache
+from .compression import CompressionPolicy
+from .etfile import EtFile, decompress_chunks
+from .metrics import (BYTES_READ, BYTES_WRITTEN, COMPRESS_SECONDS,
+                      ENTRIES_ADDED, ENTRIES_EXTRACTED, ENTRIES_READ,
+                      MKDIR_SECONDS, READ_SECONDS, SEEKS, WRITE_SECONDS,
+                      Metrics, ProgressCallback, count, measure)
+from .scheduler import read_sorted
 from . import utils
 
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Location, Raw Size, Real Size, Compressed Size, Offset, SeedValue,
+# Checksum and the rest
+_FILE_INFO_FORMAT = "<256sIIIIII36x"
+
 
 class EtFileSystem:
     __type = None
     __current_file = None
+    __mmap = None
+    # Guards seek and read on the PAK handle of lazy files
+    __lock = None
 
     _HEADER_MAGIC: Final[str] = "EyedentityGames Packing File 0.1"
     _HEADER_VERSION: Final[int] = 0xB
@@ -20,8 +42,33 @@ class EtFileSystem:
 
     __files: List[EtFile] = []
 
+    # Index of __files by normalized location, see __update_index
+    __index: Dict[str, EtFile] = {}
+    __index_folded: Dict[str, EtFile] = {}
+    __index_keys: Dict[bool, List[str]] = {}
+    __indexed_count: int = 0
+    __indexed_last: Optional[EtFile] = None
+
+    # Sidecar index of a PAK read with use_index and the files taken
+    # from it, find_file searches it while they're the files of the PAK
+    __pak_index = None
+    __pak_index_files: List[EtFile] = []
+
     def __init__(self, file_name: str):
         self.__current_file = file_name
+        self.__streaming = False
+        self.__existing = False
+        self.__dedup = False
+        self.__cache: Optional[CompressionCache] = None
+        self.__decompressed_cache: Optional[DecompressedCache] = None
+        self.__policy: Optional[CompressionPolicy] = None
+        self.__metrics: Optional[Metrics] = None
+        # Content hash of every added file that owns its compressed data
+        self.__digests: Dict[bytes, EtFile] = {}
+        self.__claimed = set()
+        self.__claimed_lock = threading.Lock()
+        # Files that share the compressed data of another file
+        self.__duplicates: Dict[EtFile, EtFile] = {}
         if not file_name or file_name[-4:] != ".pak":
             raise NameError("Invalid file name")
 
@@ -33,12 +80,35 @@ class EtFileSystem:
         })
 
     @classmethod
-    def write(cls, file_name: str):
+    def write(cls, file_name: str, streaming: bool = False,
+              dedup: bool = False, cache: Optional[CompressionCache] = None,
+              policy: Optional[CompressionPolicy] = None,
+              metrics: Optional[Metrics] = None):
         """
         Write the specified PAK in binary mode
 
         :param file_name: PAK file name to write
         :type file_name: str
+
+        :param streaming: Compress added files straight into the PAK,
+        only the file information is kept in memory. The files are read
+        back from the PAK when their data is requested
+        :type streaming: bool
+
+        :param dedup: Store the compressed data of files with
+        identical content once
+        :type dedup: bool
+
+        :param cache: Cache of compressed data that is looked up
+        before a file is compressed
+        :type cache: CompressionCache
+
+        :param policy: Compression level and strategy of the added
+        files, level 1 if not specified
+        :type policy: CompressionPolicy
+
+        :param metrics: Collector of the I/O and compression metrics
+        :type metrics: Metrics
         """
 
         cls.__type = "write"
@@ -46,65 +116,143 @@ class EtFileSystem:
         if os.path.exists(file_name):
             raise FileExistsError("File already exists. Did you mean to read?")
 
-        cls.__file = open(file_name, "wb")
+        # Streamed files are read back from the PAK being written
+        cls.__file = open(file_name, "wb+" if streaming else "wb")
+        cls.__mmap = None
+        cls.__lock = threading.Lock() if streaming else None
         cls.write_header()
-        return cls(file_name)
+
+        pak = cls(file_name)
+        pak.__streaming = streaming
+        pak.__dedup = dedup
+        pak.__cache = cache
+        pak.__policy = policy
+        pak.__metrics = metrics
+        return pak
 
     @classmethod
-    def read(cls, file_name: str):
+    def read(cls, file_name: str, lazy: bool = False, use_mmap: bool = False,
+             metrics: Optional[Metrics] = None, use_index: bool = False):
         """
         Read (and write) the specified PAK in binary mode
 
         :param file_name: PAK file name to read
         :type file_name: str
-        """
 
-        cls.__type = "read"
-
-        cls.__file = open(file_name, "rb+")
+        :param lazy: Only parse the file information table, compressed
+        data is read from the PAK when it is requested
+        :type lazy: bool
 
-        cls.__file.seek(260)
-        cls.FILE_COUNT = struct.unpack(
-            "<I",
-            cls.__file.read(4))[0]  # [0] because the return type is a tuple
+        :param use_mmap: Memory-map the PAK, compressed data is
+        accessed as slices of the mapping (implies lazy)
+        :type use_mmap: bool
 
-        cls.__file.seek(264)
-        cls._FILE_OFFSET = struct.unpack("<I", cls.__file.read(4))[0]
+        :param metrics: Collector of the I/O and decompression metrics
+        :type metrics: Metrics
 
-        offset_now = 0
-        for _ in range(cls.FILE_COUNT):
-            cls.__file.seek(cls._FILE_OFFSET + offset_now)
-
-            # Sanitize the file name
-            location = (cls.__file.read(256).decode("utf-8",
-                                                    "ignore").split("\x00",
-                                                                    1)[0])
-            if not location.isalnum() or location in "._-":
-                location = "".join(x for x in location
-                                   if (x.isalnum() or x in "/\\._- "))
-
-            file = EtFile(location=location)
+        :param use_index: Take the file information from the sidecar
+        index, see PakIndex. It's built when it's missing or stale, and
+        find_file searches it until files are added. The table is read
+        instead if the index can't be written
+        :type use_index: bool
+        """
 
-            file_info = {
-                "filesizecomp": struct.unpack("<I", cls.__file.read(4))[0],
-                "filesize": struct.unpack("<I", cls.__file.read(4))[0],
-                "alloc_size": struct.unpack("<I", cls.__file.read(4))[0],
-                "offset": struct.unpack("<I", cls.__file.read(4))[0],
-            }
+        cls.__type = "read"
+        cls.__close_pak_index()
 
-            # seek to offset, and read till allocSize
-            cls.__file.seek(file_info["offset"])
-            file_info["filedatacomp"] = cls.__file.read(
-                file_info["alloc_size"])
+        cls.__file = open(file_name, "rb+")
+        cls.__mmap = None
+        cls.__lock = threading.Lock()
+
+        pak = cls(file_name)
+        pak.__existing = True
+        pak.__metrics = metrics
+
+        if use_mmap:
+            cls.__mmap = mmap.mmap(cls.__file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            header = cls.__mmap[260:268]
+        else:
+            cls.__file.seek(260)
+            header = cls.__file.read(8)
+
+        cls.FILE_COUNT, cls._FILE_OFFSET = struct.unpack("<II", header)
+
+        index = None
+        if use_index:
+            # Imported here, index imports this module
+            from .index import PakIndex
+            try:
+                if use_mmap:
+                    index = PakIndex(file_name, source=cls.__mmap)
+                else:
+                    index = PakIndex(file_name, source=cls.__file,
+                                     lock=cls.__lock)
+            except OSError:
+                # The index is optional, e.g. the folder is read-only
+                pass
 
-            file.set_file_info(**file_info)
+        if index is not None:
+            files = index.get_files()
+            cls.__pak_index = index
+            cls.__pak_index_files = files
+        else:
+            files = cls.__read_table(use_mmap, metrics)
+        count(metrics, ENTRIES_READ, len(files))
+
+        if use_mmap:
+            if index is None:
+                for file in files:
+                    file.set_source(cls.__mmap)
+        elif lazy:
+            if index is None:
+                for file in files:
+                    file.set_source(cls.__file, cls.__lock)
+        else:
+            # In offset order, with neighbouring files read at once
+            for file, filedatacomp in read_sorted(cls.__file, files,
+                                                  metrics=metrics):
+                if filedatacomp is None:
+                    file.load_from(cls.__file, metrics)
+                else:
+                    file.set_file_info(filedatacomp=bytes(filedatacomp))
+
+        cls.__files.extend(files)
+        return pak
 
-            cls.__files.append(file)
-            offset_now += 316
+    @classmethod
+    def __read_table(cls, use_mmap: bool,
+                     metrics: Optional[Metrics]) -> List[EtFile]:
+        """
+        Read and parse the file information table, the whole table is
+        read at once and parsed in bulk
 
-        return cls(file_name)
+        :rtype: List[EtFile]
+        """
 
-    def extract(self, mode=None, directory=None):
+        table_size = cls.FILE_COUNT * 316
+        if use_mmap:
+            table = memoryview(cls.__mmap)[cls._FILE_OFFSET:cls._FILE_OFFSET +
+                                           table_size]
+        else:
+            with measure(metrics, READ_SECONDS):
+                cls.__file.seek(cls._FILE_OFFSET)
+                table = cls.__file.read(table_size)
+            count(metrics, SEEKS, 2)
+            count(metrics, BYTES_READ, 8 + len(table))
+
+        files = _parse_file_table(table)
+        if isinstance(table, memoryview):
+            table.release()
+
+        return files
+
+    def extract(self, mode=None, directory=None, workers: int = 1,
+                use_processes: bool = False,
+                progress: Optional[ProgressCallback] = None,
+                include=None, exclude=None,
+                predicate: Optional[Callable[[EtFile], bool]] = None,
+                ignore_case: bool = False) -> Dict[str, Exception]:
         """
         Extract compressed data inside PAK
 
@@ -113,27 +261,339 @@ class EtFileSystem:
 
         :param directory: Specified directory name for the extracted files
         :type mode: str
+
+        :param workers: Number of files decompressed and written concurrently
+        :type workers: int
+
+        :param use_processes: Use a process pool instead of a thread pool,
+        the decompression time isn't measured then
+        :type use_processes: bool
+
+        :param progress: Called with the number of files done, the total
+        and the location after every file
+        :type progress: Callable[[int, int, str], None]
+
+        :param include: Only extract the files matching a glob pattern,
+        e.g. \\resource\\ext\\*.dnt, or a compiled regular expression.
+        Also takes a list of them
+        :type include: Union[str, re.Pattern, List]
+
+        :param exclude: Skip the files matching a glob pattern or a
+        compiled regular expression, or a list of them
+        :type exclude: Union[str, re.Pattern, List]
+
+        :param predicate: Only extract the files it returns True for
+        :type predicate: Callable[[EtFile], bool]
+
+        :param ignore_case: Match the glob patterns case-insensitively
+        :type ignore_case: bool
+
+        :return: Errors of the files that couldn't be extracted,
+        keyed by location
+        :rtype: Dict[str, Exception]
         """
 
         # :-4 to remove ".pak"
         folder_name = (directory if directory is not None else str(
             self.__current_file)[:-4])
+        paths = self.__select_files(folder_name, mode == "strict", include,
+                                    exclude, predicate, ignore_case)
+
+        metrics = self.__metrics
+        with measure(metrics, MKDIR_SECONDS):
+            for parent in {os.path.dirname(path) for path in paths.values()}:
+                os.makedirs(parent, exist_ok=True)
+
+        errors: Dict[str, Exception] = {}
+        done = 0
+
+        def finish(file: EtFile, err: Optional[Exception]):
+            nonlocal done
+            if err is not None:
+                errors[file.get_location()] = err
+            elif metrics is not None:
+                metrics.add(ENTRIES_EXTRACTED)
+                metrics.add(BYTES_WRITTEN, file.get_file_size())
+
+            done += 1
+            if progress is not None:
+                progress(done, len(paths), file.get_location())
+
+        if workers > 1:
+            self.__extract_pooled(paths, workers, use_processes, finish)
+        else:
+            self.__extract_serial(paths, finish)
+
+        return errors
+
+    def __select_files(self, folder_name: str, strict: bool, include,
+                       exclude, predicate: Optional[Callable[[EtFile], bool]],
+                       ignore_case: bool) -> Dict[EtFile, str]:
+        """
+        Filter the files to extract on the file information, before
+        any data is read. See extract for the parameters
 
-        for file in self.__files:
-            if (mode == "strict" and file.get_file_size() == 0
+        :return: Path to extract every selected file to
+        :rtype: Dict[EtFile, str]
+        """
+
+        included = (utils.location_filter(include, ignore_case)
+                    if include is not None else None)
+        excluded = (utils.location_filter(exclude, ignore_case)
+                    if exclude is not None else None)
+
+        def selected(file: EtFile) -> bool:
+            if (strict and file.get_file_size() == 0
                     and file.get_compressed_file_size() == 0):
-                pass
+                return False
+
+            if included is not None or excluded is not None:
+                key = utils.normalize_location(file.get_location())
+                if included is not None and not included(key):
+                    return False
+                if excluded is not None and excluded(key):
+                    return False
+
+            return predicate is None or predicate(file)
+
+        # Keyed by path, so a location that is in the pak twice
+        # is written once, with the last file like before
+        jobs: Dict[str, EtFile] = {}
+        for file in self.__files:
+            if selected(file):
+                file_path = (f"{folder_name}"
+                             f"{utils.to_unix_path(file.get_location())}")
+                jobs[file_path] = file
+
+        return {file: file_path for file_path, file in jobs.items()}
+
+    def __extract_serial(self, paths: Dict[EtFile, str],
+                         finish: Callable[[EtFile, Optional[Exception]],
+                                          None]):
+        """
+        Decompress and write the files one by one, see extract
+
+        :param paths: Path to extract every file to
+        :type paths: Dict[EtFile, str]
+
+        :param finish: Called with every file and its error, or None
+        :type finish: Callable[[EtFile, Optional[Exception]], None]
+        """
+
+        metrics = self.__metrics
+        source = self.__mmap if self.__mmap is not None else self.__file
+
+        # In offset order, with neighbouring files read at once
+        for file, filedatacomp in read_sorted(source, paths, self.__lock,
+                                              metrics=metrics):
+            try:
+                if filedatacomp is None:
+                    _extract_file(file, paths[file], metrics)
+                else:
+                    _extract_data(filedatacomp, paths[file], metrics)
+            except (OSError, zlib.error) as err:
+                finish(file, err)
             else:
-                file_path = f"{folder_name}{utils.to_unix_path(file.get_location())}"
-                os.makedirs(
-                    os.path.dirname(file_path),
-                    exist_ok=True,
-                )
+                finish(file, None)
+
+    def __extract_pooled(self, paths: Dict[EtFile, str], workers: int,
+                         use_processes: bool,
+                         finish: Callable[[EtFile, Optional[Exception]],
+                                          None]):
+        """
+        Decompress and write the files on a pool of threads or
+        processes, see extract
+
+        :param paths: Path to extract every file to
+        :type paths: Dict[EtFile, str]
+
+        :param finish: Called with every file and its error, or None
+        :type finish: Callable[[EtFile, Optional[Exception]], None]
+        """
+
+        metrics = self.__metrics
+
+        # Imported when they're used, multiprocessing alone takes
+        # longer to import than the rest of the package
+        if use_processes:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(max_workers=workers)
+
+            def submit(item):
+                file, filedatacomp = item
+                # EtFile can't be pickled, send the compressed data instead
+                if filedatacomp is None:
+                    filedatacomp = file.get_compressed_data()
+                return executor.submit(_extract_data, bytes(filedatacomp),
+                                       paths[file])
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+            def submit(item):
+                file, filedatacomp = item
+                if filedatacomp is None:
+                    return executor.submit(_extract_file, file, paths[file],
+                                           metrics)
+                return executor.submit(_extract_data, filedatacomp,
+                                       paths[file], metrics)
+
+        source = self.__mmap if self.__mmap is not None else self.__file
+
+        # Every read gets its own buffer, the workers still use the
+        # data of the previous ones
+        with executor:
+            for (file, _), future in utils.bounded_submit(
+                    submit, read_sorted(source, paths, self.__lock,
+                                        reuse_buffer=False, metrics=metrics),
+                    workers * 2):
+                try:
+                    future.result()
+                except (OSError, zlib.error) as err:
+                    finish(file, err)
+                else:
+                    finish(file, None)
+
+    def verify(self, workers: int = 1,
+               progress: Optional[ProgressCallback] = None
+               ) -> Dict[str, Exception]:
+        """
+        Check every file against its checksum without decompressing it,
+        files without a checksum are decompressed instead. Read the PAK
+        with lazy or use_mmap to not hold it in memory
+
+        :param workers: Number of files checked concurrently
+        :type workers: int
+
+        :param progress: Called with the number of files done, the total
+        and the location after every file
+        :type progress: Callable[[int, int, str], None]
+
+        :return: Errors of the corrupt files, keyed by location
+        :rtype: Dict[str, Exception]
+        """
+
+        files = list(self.__files)
+        metrics = self.__metrics
+        errors: Dict[str, Exception] = {}
+        done = 0
+
+        def finish(file: EtFile, err: Optional[Exception]):
+            nonlocal done
+            if err is not None:
+                errors[file.get_location()] = err
+
+            done += 1
+            if progress is not None:
+                progress(done, len(files), file.get_location())
+
+        source = self.__mmap if self.__mmap is not None else self.__file
+
+        if workers <= 1:
+            # In offset order, with neighbouring files read at once
+            for file, filedatacomp in read_sorted(source, files, self.__lock,
+                                                  metrics=metrics):
+                try:
+                    file.verify(metrics=metrics, filedatacomp=filedatacomp)
+                except (OSError, ValueError, zlib.error) as err:
+                    finish(file, err)
+                else:
+                    finish(file, None)
+
+            return errors
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        # zlib releases the GIL while it computes the checksum
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (file, _), future in utils.bounded_submit(
+                    lambda item: executor.submit(item[0].verify,
+                                                 metrics=metrics,
+                                                 filedatacomp=item[1]),
+                    read_sorted(source, files, self.__lock,
+                                reuse_buffer=False, metrics=metrics),
+                    workers * 2):
                 try:
-                    with open(file_path, "wb") as f:
-                        f.write(file.get_decompressed_data())
-                except PermissionError:
-                    pass
+                    future.result()
+                except (OSError, ValueError, zlib.error) as err:
+                    finish(file, err)
+                else:
+                    finish(file, None)
+
+        return errors
+
+    def enable_cache(self, max_size: int) -> DecompressedCache:
+        """
+        Cache decompressed data returned by get_decompressed_data,
+        the least recently used data is evicted past max_size
+
+        :param max_size: Maximum total size of the cached data in bytes
+        :type max_size: int
+
+        :return: The cache, to read its statistics
+        :rtype: DecompressedCache
+        """
+
+        self.__decompressed_cache = DecompressedCache(max_size)
+        return self.__decompressed_cache
+
+    def get_decompressed_data(self, file: EtFile) -> bytes:
+        """
+        Decompressed data of the specified file, from the cache if
+        it's enabled
+
+        :param file: Object of EtFile inside the pak
+        :type file: EtFile
+
+        :return: Decompressed data
+        :rtype: bytes
+        """
+
+        if self.__decompressed_cache is None:
+            return file.get_decompressed_data(self.__metrics)
+
+        data = self.__decompressed_cache.get(file)
+        if data is None:
+            data = file.get_decompressed_data(self.__metrics)
+            self.__decompressed_cache.put(file, data)
+
+        return data
+
+    def get_many(self, files: List[EtFile]) -> List[bytes]:
+        """
+        Decompressed data of many files, read in offset order with
+        neighbouring files read at once. Uses the cache if it's enabled
+
+        :param files: EtFile objects inside the pak
+        :type files: List[EtFile]
+
+        :return: Decompressed data, in the same order as files
+        :rtype: List[bytes]
+        """
+
+        cache = self.__decompressed_cache
+        found: Dict[EtFile, bytes] = {}
+        missing = []
+        for file in dict.fromkeys(files):
+            data = cache.get(file) if cache is not None else None
+            if data is None:
+                missing.append(file)
+            else:
+                found[file] = data
+
+        source = self.__mmap if self.__mmap is not None else self.__file
+        for file, filedatacomp in read_sorted(source, missing, self.__lock,
+                                              metrics=self.__metrics):
+            if filedatacomp is None:
+                data = file.get_decompressed_data(self.__metrics)
+            else:
+                data = b"".join(decompress_chunks([filedatacomp],
+                                                  metrics=self.__metrics))
+            if cache is not None:
+                cache.put(file, data)
+            found[file] = data
+
+        return [found[file] for file in files]
 
     def get_files(self) -> List[EtFile]:
         """
@@ -145,22 +605,114 @@ class EtFileSystem:
 
         return self.__files
 
-    def find_file(self, location: str) -> EtFile:
+    def find_file(self, location: str, ignore_case: bool = False) -> EtFile:
         """
-        :param location: Location of the file in pak
+        :param location: Location of the file in pak, either separator
+        can be used
         :type location: str
 
+        :param ignore_case: Match the location case-insensitively,
+        like the game does
+        :type ignore_case: bool
+
         :return: EtFile object that match the location
         :rtype: EtFile
         """
 
-        filtered_file = next(
-            filter(lambda file: file.get_location() == location,
-                   self.__files), )
+        files = self.__pak_index_files
+        if (self.__pak_index is not None and len(files) == len(self.__files)
+                and (not files or files[-1] is self.__files[-1])):
+            # Binary search in the sidecar index, the file information
+            # table and the index have the same order
+            return files[self.__pak_index.find_position(location,
+                                                        ignore_case)]
+
+        self.__update_index()
+
+        key = utils.normalize_location(location)
+        try:
+            if ignore_case:
+                return self.__index_folded[key.casefold()]
+            return self.__index[key]
+        except KeyError:
+            raise FileNotFoundError(
+                f"{location} doesn't exist in the pak") from None
+
+    def find_files(self, pattern: str,
+                   ignore_case: bool = False) -> List[EtFile]:
+        """
+        Find files whose location match a glob pattern, a pattern
+        ending with a separator matches everything under that folder
+
+        :param pattern: Glob pattern, e.g. \\resource\\ext\\*.dnt
+        :type pattern: str
 
-        return filtered_file
+        :param ignore_case: Match the pattern case-insensitively
+        :type ignore_case: bool
 
-    def add_file(self, file_name, location):
+        :return: EtFile objects sorted by location
+        :rtype: List[EtFile]
+        """
+
+        self.__update_index()
+
+        key = utils.normalize_pattern(pattern)
+        if ignore_case:
+            key = key.casefold()
+
+        index = self.__index_folded if ignore_case else self.__index
+        keys = self.__index_keys.get(ignore_case)
+        if keys is None:
+            keys = self.__index_keys[ignore_case] = sorted(index)
+
+        # Only the keys that start with the literal part of the
+        # pattern can match, and they're next to each other
+        prefix = key
+        for i, char in enumerate(key):
+            if char in "*?[":
+                prefix = key[:i]
+                break
+
+        files = []
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            if fnmatchcase(keys[i], key):
+                files.append(index[keys[i]])
+
+        return files
+
+    @classmethod
+    def __update_index(cls):
+        """
+        Index the files added since the last lookup, or index every
+        file again if the list was cleared or replaced
+        """
+
+        files = cls.__files
+        if (cls.__indexed_count > len(files) or cls.__indexed_count and
+                files[cls.__indexed_count - 1] is not cls.__indexed_last):
+            cls.__index = {}
+            cls.__index_folded = {}
+            cls.__index_keys = {}
+            cls.__indexed_count = 0
+            cls.__indexed_last = None
+
+        if cls.__indexed_count == len(files):
+            return
+
+        for file in files[cls.__indexed_count:]:
+            key = utils.normalize_location(file.get_location())
+            # The first file wins when a location is in the pak twice
+            cls.__index.setdefault(key, file)
+            cls.__index_folded.setdefault(key.casefold(), file)
+
+        cls.__index_keys = {}
+        cls.__indexed_count = len(files)
+        cls.__indexed_last = files[-1]
+
+    def add_file(self, file_name, location,
+                 policy: Optional[CompressionPolicy] = None):
         """
         Add the specified file to the pak
 
@@ -170,6 +722,10 @@ class EtFileSystem:
         :param location: Location of the file that
         will be put in the pak.
         :type location: str
+
+        :param policy: Compression policy of this call, instead of
+        the policy of the pak
+        :type policy: CompressionPolicy
         """
 
         self.__type = "write"
@@ -180,28 +736,210 @@ class EtFileSystem:
         if location[0] != "\\":
             location = f"\\{utils.to_windows_path(location)}"
 
-        self.__files.append(EtFile(file_name, location))
+        self.__add(file_name, location, policy or self.__policy)
 
-    def add_files(self, folder: str):
+    def add_files(self, folder: str, workers: int = 1,
+                  policy: Optional[CompressionPolicy] = None,
+                  progress: Optional[ProgressCallback] = None):
         """
         Add the all files inside specified folder to the pak
 
         :param folder: Path of the folder
         :type folder: str
+
+        :param workers: Number of files read and compressed concurrently,
+        files are still added in the same order
+        :type workers: int
+
+        :param policy: Compression policy of this call, instead of
+        the policy of the pak
+        :type policy: CompressionPolicy
+
+        :param progress: Called with the number of files added, the total
+        and the location after every file
+        :type progress: Callable[[int, int, str], None]
         """
 
+        policy = policy or self.__policy
+
         self.__type = "write"
 
         if not os.path.exists(folder):
             raise FileNotFoundError("Folder doesn't exist")
 
         files = glob(f"{folder}/**/*.*", recursive=True)
+        locations = [
+            (file,
+             f"\\{utils.to_windows_path(os.path.relpath(file, folder))}")
+            for file in files
+        ]
+
+        if workers <= 1:
+            for done, (file, location) in enumerate(locations, 1):
+                self.__add(file, location, policy)
+                if progress is not None:
+                    progress(done, len(locations), location)
+            return
+
+        # Duplicates whose original isn't added yet, by content hash
+        pending: Dict[bytes, List[EtFile]] = {}
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        # zlib releases the GIL, so threads compress in parallel
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for done, ((_, location), future) in enumerate(
+                    utils.bounded_submit(
+                        lambda item: executor.submit(self.__load, *item,
+                                                     policy),
+                        locations, workers * 2), 1):
+                file, digest = future.result()
+                count(self.__metrics, ENTRIES_ADDED)
+
+                if file is None:
+                    file = EtFile(location=location)
+                    if digest in self.__digests:
+                        self.__link_duplicate(file, self.__digests[digest])
+                    else:
+                        pending.setdefault(digest, []).append(file)
+                    self.__files.append(file)
+                else:
+                    if self.__streaming:
+                        self.__write_file(file)
+                    self.__files.append(file)
+
+                    if digest is not None:
+                        self.__digests[digest] = file
+                        for duplicate in pending.pop(digest, []):
+                            self.__link_duplicate(duplicate, file)
+
+                if progress is not None:
+                    progress(done, len(locations), location)
+
+    def __add(self, file_name: str, location: str,
+              policy: Optional[CompressionPolicy]):
+        """
+        Compress the specified file and add it to the pak
+
+        :param file_name: Path of the specified file
+        :type file_name: str
+
+        :param location: Location of the file inside pak
+        :type location: str
+
+        :param policy: Compression policy, level 1 if None
+        :type policy: CompressionPolicy
+        """
+
+        count(self.__metrics, ENTRIES_ADDED)
+
+        digest = None
+        if self.__dedup:
+            digest = _hash_file(file_name)
+            if digest in self.__digests:
+                file = EtFile(location=location)
+                self.__link_duplicate(file, self.__digests[digest])
+                self.__files.append(file)
+                return
+
+            self.__claimed.add(digest)
+
+        if self.__streaming and self.__cache is None:
+            file = self.__stream_file(file_name, location, policy)
+        else:
+            file = self.__compress(file_name, location, policy)
+            if self.__streaming:
+                self.__write_file(file)
+        self.__files.append(file)
+
+        if digest is not None:
+            self.__digests[digest] = file
+
+    def __load(self, file_name: str, location: str,
+               policy: Optional[CompressionPolicy]):
+        """
+        Compress the specified file on a worker thread, unless it's a
+        duplicate of a file that another worker compresses
+
+        :return: EtFile object, or None for a duplicate, and content hash
+        :rtype: Tuple[Optional[EtFile], Optional[bytes]]
+        """
+
+        digest = None
+        if self.__dedup:
+            digest = _hash_file(file_name)
+            with self.__claimed_lock:
+                if digest in self.__claimed:
+                    return None, digest
+                self.__claimed.add(digest)
 
-        for file in files:
-            path = utils.to_windows_path(os.path.relpath(file, folder))
-            self.__files.append(EtFile(file, f"\\{path}"))
+        return self.__compress(file_name, location, policy), digest
 
-    def edit_file(self, file: EtFile, filedata: bytes):
+    def __compress(self, file_name: str, location: str,
+                   policy: Optional[CompressionPolicy]) -> EtFile:
+        """
+        Compress the specified file, or take its compressed
+        data from the cache
+
+        :param file_name: Path of the specified file
+        :type file_name: str
+
+        :param location: Location of the file inside pak
+        :type location: str
+
+        :param policy: Compression policy, level 1 if None
+        :type policy: CompressionPolicy
+
+        :rtype: EtFile
+        """
+
+        if self.__cache is None:
+            return EtFile(file_name, location, policy, self.__metrics)
+
+        key = policy.get_key() if policy is not None else 1
+        filedatacomp = self.__cache.get(file_name, key)
+        if filedatacomp is not None:
+            file = EtFile(location=location)
+            file.set_file_info(filesizecomp=len(filedatacomp),
+                               filesize=os.stat(file_name).st_size,
+                               filedatacomp=filedatacomp,
+                               dirty=True,
+                               checksum=zlib.crc32(filedatacomp))
+            return file
+
+        file = EtFile(file_name, location, policy, self.__metrics)
+        self.__cache.put(file_name, file.get_compressed_data(), key)
+        return file
+
+    def __link_duplicate(self, file: EtFile, original: EtFile):
+        """
+        Make file share the compressed data of original
+
+        :param file: Object of EtFile with only the location
+        :type file: EtFile
+
+        :param original: Object of EtFile with the same content
+        :type original: EtFile
+        """
+
+        filedatacomp = None
+        if self.__streaming and not original.is_loaded():
+            # Streamed already, the data is read back from the PAK
+            file.set_source(self.__file, self.__lock)
+        else:
+            filedatacomp = original.get_compressed_data()
+
+        file.set_file_info(filesizecomp=original.get_compressed_file_size(),
+                           filesize=original.get_file_size(),
+                           alloc_size=original.get_alloc_size(),
+                           offset=original.get_offset(),
+                           filedatacomp=filedatacomp,
+                           dirty=original.is_dirty(),
+                           checksum=original.get_checksum())
+        self.__duplicates[file] = original
+
+    def edit_file(self, file: EtFile, filedata: bytes,
+                  policy: Optional[CompressionPolicy] = None):
         """
         Edit the specified EtFile object data
 
@@ -210,38 +948,308 @@ class EtFileSystem:
 
         :param filedata: File data that will be written
         :type filedata: bytes
+
+        :param policy: Compression policy of this call, instead of
+        the policy of the pak
+        :type policy: CompressionPolicy
         :return:
         """
         self.__type = "write"
+        policy = policy or self.__policy
         try:
-            filedatacomp = zlib.compress(filedata, 1)
+            with measure(self.__metrics, COMPRESS_SECONDS):
+                if policy is not None:
+                    filedatacomp = policy.compress(filedata,
+                                                   file.get_location())
+                else:
+                    filedatacomp = zlib.compress(filedata, 1)
             filesize = len(filedata)
             filesizecomp = len(binascii.hexlify(filedatacomp)) // 2
             file_info = {
                 "filesize": filesize,
                 "filedatacomp": filedatacomp,
-                "filesizecomp": filesizecomp
+                "filesizecomp": filesizecomp,
+                "dirty": True,
+                "checksum": zlib.crc32(filedatacomp),
             }
             file_index = self.__files.index(file)
+            self.__unlink_duplicates(self.__files[file_index])
             self.__files[file_index].set_file_info(**file_info)
+            if self.__decompressed_cache is not None:
+                self.__decompressed_cache.invalidate(self.__files[file_index])
         except zlib.error as err:
             raise err
 
-    def close_file_system(self):
+    def __unlink_duplicates(self, file: EtFile):
+        """
+        Stop file from sharing compressed data before it's edited,
+        its first duplicate takes over the data of an original
+
+        :param file: Object of EtFile that will be edited
+        :type file: EtFile
+        """
+
+        self.__duplicates.pop(file, None)
+
+        duplicates = [f for f, original in self.__duplicates.items()
+                      if original is file]
+        if duplicates:
+            successor = duplicates[0]
+            del self.__duplicates[successor]
+            for f in duplicates[1:]:
+                self.__duplicates[f] = successor
+
+        for digest, original in self.__digests.items():
+            if original is file:
+                if duplicates:
+                    self.__digests[digest] = duplicates[0]
+                else:
+                    del self.__digests[digest]
+                    self.__claimed.discard(digest)
+                break
+
+    def get_fragmentation(self) -> Dict[str, float]:
+        """
+        Report the space in the PAK that isn't used by the header,
+        the compressed data of the files or the file information
+
+        :return: file_size, used_size and wasted_size in bytes, and
+        fragmentation, the ratio of wasted_size to file_size
+        :rtype: Dict[str, float]
+        """
+
+        file_size = os.fstat(self.__file.fileno()).st_size
+
+        # Files can share their compressed data
+        used = {}
+        for f in self.__files:
+            if f.get_offset() > 0 and not f.is_dirty():
+                used[f.get_offset()] = max(used.get(f.get_offset(), 0),
+                                           f.get_compressed_file_size())
+
+        used_size = min(file_size,
+                        1024 + sum(used.values()) + self.FILE_COUNT * 316)
+        wasted_size = file_size - used_size
+
+        return {
+            "file_size": file_size,
+            "used_size": used_size,
+            "wasted_size": wasted_size,
+            "fragmentation": wasted_size / file_size if file_size else 0.0,
+        }
+
+    def compact(self, file_name: Optional[str] = None) -> int:
+        """
+        Write the files packed tightly one after another, the compressed
+        data is copied as it is. Files sharing compressed data keep
+        sharing it
+
+        :param file_name: PAK file name to write the compacted PAK to,
+        the PAK itself is compacted if not specified
+        :type file_name: str
+
+        :return: Size in bytes the compacted PAK is smaller by
+        :rtype: int
+        """
+
+        if not self.__existing:
+            raise ValueError("Only a PAK opened with read can be compacted")
+
+        target = file_name if file_name is not None else (
+            f"{self.__current_file}.compact")
+        if file_name is not None and os.path.exists(file_name):
+            raise FileExistsError("File already exists")
+
+        layout = []
+        copied: Dict[int, int] = {}
+        with open(target, "wb") as out:
+            out.write(self._pack_header(0, 0))
+
+            for f in self.__files:
+                shared = f.get_offset() > 0 and not f.is_dirty()
+                if shared and f.get_offset() in copied:
+                    layout.append((f, copied[f.get_offset()]))
+                    continue
+
+                offset = out.tell()
+                filedatacomp = f.get_compressed_data()
+                out.write(filedatacomp[:f.get_compressed_file_size()])
+                layout.append((f, offset))
+                if shared:
+                    copied[f.get_offset()] = offset
+
+            file_offset = out.tell()
+            for f, offset in layout:
+                moved = EtFile(location=f.get_location())
+                moved.set_file_info(filesizecomp=f.get_compressed_file_size(),
+                                    filesize=f.get_file_size(),
+                                    offset=offset,
+                                    checksum=f.get_checksum())
+                out.write(moved.get_file_info())
+
+            out.seek(0)
+            out.write(self._pack_header(len(layout), file_offset))
+            out.seek(0, os.SEEK_END)
+            size = out.tell()
+
+        reclaimed = os.fstat(self.__file.fileno()).st_size - size
+        if file_name is not None:
+            return reclaimed
+
+        self.__reopen(target)
+        self.FILE_COUNT = len(layout)
+        self._FILE_OFFSET = file_offset
+        for f, offset in layout:
+            f.set_file_info(offset=offset,
+                            alloc_size=f.get_compressed_file_size(),
+                            dirty=False)
+
+        return reclaimed
+
+    def __reopen(self, file_name: str):
+        """
+        Replace the PAK with the specified file and point the
+        files to the new handle
+
+        :param file_name: File that replaces the PAK
+        :type file_name: str
+        """
+
+        use_mmap = self.__mmap is not None
+        if use_mmap:
+            try:
+                self.__mmap.close()
+            except BufferError:
+                pass
+
+        self.__file.close()
+        os.replace(file_name, self.__current_file)
+        self.__close_pak_index()
+        self.__remove_index()
+
+        cls = type(self)
+        cls.__file = open(self.__current_file, "rb+")
+        cls.__mmap = None
+        cls.__lock = threading.Lock()
+        if use_mmap:
+            cls.__mmap = mmap.mmap(cls.__file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+
+        for f in self.__files:
+            if use_mmap:
+                f.set_source(cls.__mmap)
+            else:
+                f.set_source(cls.__file, cls.__lock)
+
+        # Everything is written already
+        self.__type = "read"
+
+    def close_file_system(self, incremental: bool = False):
         """
         Required every time you read or write PAK
 
         Write header, compressed data, and file information to PAK
+
+        :param incremental: Only write the edited and added files and the
+        file information, the other files stay where they are in the PAK.
+        Only has an effect on a PAK opened with read
+        :type incremental: bool
         """
 
-        if self.__type == "write":
-            self.__file.seek(1024)
-            self.__write_data()
+        incremental = incremental and self.__existing
+
+        if self.__type == "write" and not incremental and not self.__streaming:
+            # Lazy files are read from the same handle that is written to
+            for f in self.__files:
+                f.load()
+
+        self.__close_mmap()
+
+        if self.__type == "write" and incremental:
+            self.__write_changed_data()
+            self.__write_footer()
+            self.__file.truncate()
+        elif self.__type == "write":
+            # Streamed files are already written, only edited
+            # files are appended
+            if not self.__streaming:
+                self.__file.seek(1024)
+                self.__write_data()
+            else:
+                # Reading streamed files moves the position
+                self.__file.seek(0, os.SEEK_END)
+                for f in self.__files:
+                    if f.is_dirty() and f not in self.__duplicates:
+                        self.__write_file(f)
+                self.__write_duplicates()
             self.__write_footer()
 
+        if self.__type == "write":
+            self.__remove_index()
+
+        self.__close()
+
+    def discard_file_system(self):
+        """
+        Close the PAK without writing the changes to it, e.g. when
+        adding files failed. A PAK opened with write is incomplete,
+        so it's removed
+        """
+
+        self.__close_mmap()
+        self.__close()
+        if not self.__existing:
+            os.remove(self.__current_file)
+
+    def __close_mmap(self):
+        """
+        Close the memory map of the PAK, if it's mapped
+        """
+
+        if self.__mmap is not None:
+            try:
+                self.__mmap.close()
+            except BufferError:
+                # A memoryview of the map is still alive somewhere,
+                # the map is closed when it's garbage collected
+                pass
+
+    def __close(self):
+        """
+        Forget the files and close the PAK
+        """
+
+        if self.__decompressed_cache is not None:
+            self.__decompressed_cache.clear()
+
+        self.__close_pak_index()
         self.__files.clear()
+        self.__update_index()
         self.__file.close()
 
+    @classmethod
+    def __close_pak_index(cls):
+        """
+        Close the sidecar index of a PAK read with use_index
+        """
+
+        if cls.__pak_index is not None:
+            cls.__pak_index.close()
+            cls.__pak_index = None
+            cls.__pak_index_files = []
+
+    def __remove_index(self):
+        """
+        Remove the sidecar index of the PAK after it's written, it would
+        be rebuilt anyway unless the size and modification time are the
+        same as before
+        """
+
+        try:
+            os.remove(utils.index_file_name(self.__current_file))
+        except FileNotFoundError:
+            pass
+
     @classmethod
     def write_header(cls):
         """
@@ -256,39 +1264,308 @@ class EtFileSystem:
         1024 bytes in total - UINT8
         """
 
-        cls.__file.write(bytes(cls._HEADER_MAGIC, "utf-8"))
-        cls.__file.write(struct.pack("<x") * 224)
-        cls.__file.write(struct.pack("<I", cls._HEADER_VERSION))
-        cls.__file.write(struct.pack("<I", cls.FILE_COUNT))
-        cls.__file.write(struct.pack("<I", cls._FILE_OFFSET))
-        cls.__file.write(struct.pack("<I", 0))
-        cls.__file.write(struct.pack("<x") * 752)
+        cls.__file.write(cls._pack_header(cls.FILE_COUNT, cls._FILE_OFFSET))
+
+    @classmethod
+    def _pack_header(cls, file_count: int, file_offset: int) -> bytes:
+        """
+        Pack the 1024 bytes PAK header, see write_header
+
+        :param file_count: Number of files in the PAK
+        :type file_count: int
+
+        :param file_offset: Pointer to the location of file information list
+        :type file_offset: int
+
+        :rtype: bytes
+        :return: Header
+        """
+
+        data = bytes(cls._HEADER_MAGIC, "utf-8")
+        data += struct.pack("<x") * 224
+        data += struct.pack("<I", cls._HEADER_VERSION)
+        data += struct.pack("<I", file_count)
+        data += struct.pack("<I", file_offset)
+        data += struct.pack("<I", 0)
+        data += struct.pack("<x") * 752
+        return data
 
-    def __rewrite_header(self):
+    def __rewrite_header(self, file_offset: int):
         """
         Rewrite header with real file count and offset
+
+        :param file_offset: Offset of the file information, which is
+        already written
+        :type file_offset: int
         """
 
+        end = self.__file.tell()
         self.FILE_COUNT = len(self.__files)
-        self._FILE_OFFSET = self.__file.tell()
+        self._FILE_OFFSET = file_offset
 
         self.__file.seek(256 + 4)
         self.__file.write(struct.pack("<I", self.FILE_COUNT))
         self.__file.write(struct.pack("<I", self._FILE_OFFSET))
-        self.__file.seek(self._FILE_OFFSET, os.SEEK_SET)
+        self.__file.seek(end, os.SEEK_SET)
 
     def __write_data(self):
         """
         Write compressed data to PAK
         """
+        # Files read from the pak that share their compressed data
+        # keep sharing it
+        written: Dict[int, int] = {}
+
         for f in self.__files:
-            f.set_offset(self.__file.tell())
-            self.__file.write(f.get_compressed_data())
+            if f in self.__duplicates:
+                continue
 
-    def __write_footer(self):
+            shared = f.get_offset() > 0 and not f.is_dirty()
+            if shared and f.get_offset() in written:
+                f.set_offset(written[f.get_offset()])
+                continue
+
+            filedatacomp = f.get_compressed_data()
+            if shared:
+                written[f.get_offset()] = self.__file.tell()
+            f.set_file_info(offset=self.__file.tell(),
+                            alloc_size=len(filedatacomp),
+                            dirty=False)
+            self.__write(filedatacomp)
+
+        self.__write_duplicates()
+
+    def __write_duplicates(self):
         """
-        Write file information to PAK
+        Point the duplicates to the compressed data of their original
         """
-        self.__rewrite_header()
+
+        for f, original in self.__duplicates.items():
+            f.set_file_info(offset=original.get_offset(),
+                            alloc_size=original.get_alloc_size(),
+                            dirty=False)
+
+    def __write_changed_data(self):
+        """
+        Write compressed data of edited and added files to PAK
+
+        An edited file is written back to its place if it fits in the
+        allocation size, otherwise it's appended after the data
+        """
+
+        # Edited files can be written back to their place, so every
+        # allocation stays reserved. The current file information stays
+        # valid until the new one is written, so nothing is appended
+        # over it and the PAK can be read if writing is interrupted.
+        # Only appended files are safe then: a file written back to its
+        # place has new data under its old size and checksum, which
+        # verify reports
+        table_end = self._FILE_OFFSET + self.FILE_COUNT * 316
+        end = max(1024, table_end)
+        for f in self.__files:
+            if f.get_offset() > 0:
+                end = max(end, f.get_offset() + f.get_alloc_size())
+
+        # Compressed data that is shared can't be overwritten in place
+        sharing = Counter(f.get_offset() for f in self.__files)
+
         for f in self.__files:
-            self.__file.write(f.get_file_info())
+            if not f.is_dirty():
+                continue
+
+            filedatacomp = f.get_compressed_data()
+            if (0 < f.get_offset() and sharing[f.get_offset()] == 1
+                    and len(filedatacomp) <= f.get_alloc_size()):
+                self.__file.seek(f.get_offset())
+                f.set_file_info(dirty=False)
+            else:
+                self.__file.seek(end)
+                f.set_file_info(offset=end,
+                                alloc_size=len(filedatacomp),
+                                dirty=False)
+                end += len(filedatacomp)
+
+            count(self.__metrics, SEEKS)
+            self.__write(filedatacomp)
+
+        if end == table_end and len(self.__files) == self.FILE_COUNT:
+            # Nothing was appended, the file information is only written
+            # over itself when it's the same
+            self.__file.seek(self._FILE_OFFSET)
+            table = self.__file.read(table_end - self._FILE_OFFSET)
+            if table == b"".join(f.get_file_info() for f in self.__files):
+                self.__file.seek(self._FILE_OFFSET)
+                return
+
+        self.__file.seek(end)
+
+    def __stream_file(self, file_name: str, location: str,
+                      policy: Optional[CompressionPolicy]) -> EtFile:
+        """
+        Compress the specified file in chunks straight into the PAK
+
+        :param file_name: Path of the specified file
+        :type file_name: str
+
+        :param location: Location of the file inside pak
+        :type location: str
+
+        :param policy: Compression policy, level 1 if None
+        :type policy: CompressionPolicy
+
+        :return: EtFile object with only the file information
+        :rtype: EtFile
+        """
+
+        filesize = 0
+        checksum = 0
+        metrics = self.__metrics
+
+        # Reading streamed files moves the position, and reads wait
+        # until the file is written
+        with self.__lock:
+            offset = self.__file.seek(0, os.SEEK_END)
+            with open(file_name, "rb") as handle:
+                with measure(metrics, READ_SECONDS):
+                    chunk = handle.read(STREAM_CHUNK_SIZE)
+                # The first chunk is the sample the policy can try
+                if policy is not None:
+                    compressor = policy.compressobj(location, chunk)
+                else:
+                    compressor = zlib.compressobj(1)
+
+                while chunk:
+                    filesize += len(chunk)
+                    with measure(metrics, COMPRESS_SECONDS):
+                        data = compressor.compress(chunk)
+                    checksum = zlib.crc32(data, checksum)
+                    self.__write(data)
+                    with measure(metrics, READ_SECONDS):
+                        chunk = handle.read(STREAM_CHUNK_SIZE)
+            count(metrics, BYTES_READ, filesize)
+            with measure(metrics, COMPRESS_SECONDS):
+                data = compressor.flush()
+            checksum = zlib.crc32(data, checksum)
+            self.__write(data)
+            end = self.__file.tell()
+
+        file = EtFile(location=location)
+        file.set_file_info(filesizecomp=end - offset,
+                           filesize=filesize,
+                           alloc_size=end - offset,
+                           offset=offset,
+                           checksum=checksum)
+        file.set_source(self.__file, self.__lock)
+        return file
+
+    def __write_file(self, file: EtFile):
+        """
+        Write the compressed data of an EtFile object to the end of
+        the PAK and drop it from memory, it's read back from the PAK
+
+        :param file: Object of EtFile that will be written
+        :type file: EtFile
+        """
+
+        filedatacomp = file.get_compressed_data()
+        with self.__lock:
+            offset = self.__file.seek(0, os.SEEK_END)
+            self.__write(filedatacomp)
+        file.set_file_info(offset=offset,
+                           alloc_size=len(filedatacomp),
+                           filedatacomp=b"",
+                           dirty=False)
+        file.set_source(self.__file, self.__lock)
+
+    def __write_footer(self):
+        """
+        Write file information to PAK, the header points to it only
+        after it's written
+        """
+
+        file_offset = self.__file.tell()
+        self.__write(b"".join(f.get_file_info() for f in self.__files))
+        self.__file.flush()
+        self.__rewrite_header(file_offset)
+
+    def __write(self, data: bytes):
+        """
+        Write to the PAK at the current position
+
+        :param data: Data that will be written
+        :type data: bytes
+        """
+
+        with measure(self.__metrics, WRITE_SECONDS):
+            self.__file.write(data)
+        count(self.__metrics, BYTES_WRITTEN, len(data))
+
+
+def _parse_file_table(table) -> List[EtFile]:
+    """
+    Parse the file information table, see EtFile.get_file_info
+
+    :param table: File information of every file
+    :type table: bytes
+
+    :return: EtFile objects without compressed data
+    :rtype: List[EtFile]
+    """
+
+    files = []
+    for (location, filesizecomp, filesize, alloc_size, offset, _,
+         checksum) in struct.iter_unpack(_FILE_INFO_FORMAT, table):
+        # The location is used as it's stored, without going
+        # through Path like EtFile(location=...) does
+        file = EtFile()
+        file.set_file_info(filesizecomp=filesizecomp,
+                           filesize=filesize,
+                           alloc_size=alloc_size,
+                           offset=offset,
+                           location=utils.sanitize_location(location),
+                           checksum=checksum)
+        files.append(file)
+
+    return files
+
+
+def _read_file_table(handle) -> List[EtFile]:
+    """
+    Read and parse the file information table of a PAK
+
+    :param handle: Binary file object of the PAK
+    :type handle: BinaryIO
+
+    :return: EtFile objects without compressed data
+    :rtype: List[EtFile]
+    """
+
+    handle.seek(260)
+    file_count, file_offset = struct.unpack("<II", handle.read(8))
+    handle.seek(file_offset)
+    return _parse_file_table(handle.read(file_count * 316))
+
+
+def _hash_file(file_name: str) -> bytes:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_name, "rb") as handle:
+        for chunk in iter(lambda: handle.read(STREAM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.digest()
+
+
+def _extract_file(file: EtFile, file_path: str,
+                  metrics: Optional[Metrics] = None):
+    with open(file_path, "wb") as f:
+        for chunk in file.iter_chunks(metrics=metrics):
+            with measure(metrics, WRITE_SECONDS):
+                f.write(chunk)
+
+
+def _extract_data(filedatacomp: bytes, file_path: str,
+                  metrics: Optional[Metrics] = None):
+    with open(file_path, "wb") as f:
+        for chunk in decompress_chunks([filedatacomp], metrics=metrics):
+            with measure(metrics, WRITE_SECONDS):
+                f.write(chunk)
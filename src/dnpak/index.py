@@ -0,0 +1,364 @@
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+from .etfile import EtFile
+from .etfilesystem import _read_file_table
+from . import utils
+
+_MAGIC = b"DNPAKID1"
+
+# Magic, PAK size, PAK modification time, file information offset,
+# file count and size of the locations
+_HEADER_FORMAT = "<8sQQIII"
+_HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+
+# Location position and length, Raw Size, Real Size, Compressed Size,
+# Offset, Checksum and position in the file information table
+_RECORD_FORMAT = "<IIIIIIII"
+_RECORD_SIZE = struct.calcsize(_RECORD_FORMAT)
+
+
+class PakIndex:
+    def __init__(self, file_name: str, index_file_name: Optional[str] = None,
+                 source=None, lock=None):
+        """
+        Sidecar index of the file information of a PAK, sorted by
+        normalized location. It's built when it's missing or the PAK
+        changed, and looking up a file is a binary search in the
+        memory-mapped index
+
+        :param file_name: PAK file name
+        :type file_name: str
+
+        :param index_file_name: Index file name, the PAK file name
+        with .idx appended if not specified
+        :type index_file_name: str
+
+        :param source: Binary file object or memory map of the PAK the
+        returned files read their data from, the PAK is opened when
+        it's needed if not specified
+        :type source: BinaryIO or mmap.mmap
+
+        :param lock: Lock guarding seek and read on source
+        :type lock: threading.Lock
+        """
+
+        self.__file_name = file_name
+        self.__index_file_name = (index_file_name if index_file_name
+                                  is not None else utils.index_file_name(
+                                      file_name))
+        self.__handle = None
+        self.__mmap = None
+        self.__file_count = 0
+        self.__source = source
+        self.__lock = lock
+        # The PAK handle opened by this index, see __attach
+        self.__pak = None
+
+        try:
+            stamp = _stamp(file_name)
+            if not self.__open(stamp):
+                self.build(file_name, self.__index_file_name)
+                if not self.__open(stamp):
+                    raise ValueError(f"{self.__index_file_name} changed "
+                                     f"while it was opened")
+        except BaseException:
+            self.close()
+            raise
+
+    def __repr__(self):
+        return str({
+            "file_name": self.__file_name,
+            "index_file_name": self.__index_file_name,
+            "file_count": self.__file_count,
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        return self.__file_count
+
+    @staticmethod
+    def build(file_name: str, index_file_name: Optional[str] = None):
+        """
+        Write the index of the specified PAK
+
+        :param file_name: PAK file name
+        :type file_name: str
+
+        :param index_file_name: Index file name, the PAK file name
+        with .idx appended if not specified
+        :type index_file_name: str
+        """
+
+        if index_file_name is None:
+            index_file_name = utils.index_file_name(file_name)
+
+        stamp = _stamp(file_name)
+        with open(file_name, "rb") as handle:
+            files = _read_file_table(handle)
+
+        keys = [utils.normalize_location(f.get_location()) for f in files]
+        order = sorted(range(len(files)), key=keys.__getitem__)
+        # Positions in order, sorted by case-folded location
+        folded = sorted(range(len(files)),
+                        key=lambda i: (keys[order[i]].casefold(), order[i]))
+
+        locations = bytearray()
+        records = bytearray()
+        for position in order:
+            file = files[position]
+            location = file.get_location().encode("utf-8")
+            records += struct.pack(_RECORD_FORMAT, len(locations),
+                                   len(location),
+                                   file.get_compressed_file_size(),
+                                   file.get_file_size(),
+                                   file.get_alloc_size(), file.get_offset(),
+                                   file.get_checksum(), position)
+            locations += location
+
+        # Written to a temporary file first, so a reader never sees
+        # half of the index
+        descriptor, temporary = tempfile.mkstemp(
+            prefix=".", dir=os.path.dirname(os.path.abspath(index_file_name)))
+        try:
+            with os.fdopen(descriptor, "wb") as out:
+                out.write(struct.pack(_HEADER_FORMAT, _MAGIC, *stamp,
+                                      len(files), len(locations)))
+                out.write(records)
+                out.write(struct.pack(f"<{len(folded)}I", *folded))
+                out.write(locations)
+            os.replace(temporary, index_file_name)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def find_file(self, location: str, ignore_case: bool = False) -> EtFile:
+        """
+        :param location: Location of the file in pak, either separator
+        can be used
+        :type location: str
+
+        :param ignore_case: Match the location case-insensitively
+        :type ignore_case: bool
+
+        :return: EtFile object that reads its data from the PAK
+        :rtype: EtFile
+        """
+
+        file = self.__file(self.__search(location, ignore_case))[0]
+        self.__attach(file)
+        return file
+
+    def find_position(self, location: str, ignore_case: bool = False) -> int:
+        """
+        :param location: Location of the file in pak, either separator
+        can be used
+        :type location: str
+
+        :param ignore_case: Match the location case-insensitively
+        :type ignore_case: bool
+
+        :return: Position of the file in the file information table,
+        the same as in get_files
+        :rtype: int
+        """
+
+        record = self.__search(location, ignore_case)
+        return struct.unpack_from("<I", self.__mmap, _HEADER_SIZE +
+                                  record * _RECORD_SIZE + _RECORD_SIZE - 4)[0]
+
+    def __search(self, location: str, ignore_case: bool) -> int:
+        """
+        :return: Position of the first record of the location in
+        location order
+        :rtype: int
+        """
+
+        key = utils.normalize_location(location)
+        if ignore_case:
+            key = key.casefold()
+
+        # Binary search, the first match like EtFileSystem.find_file
+        low, high = 0, self.__file_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__key(middle, ignore_case) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == self.__file_count or self.__key(low, ignore_case) != key:
+            raise FileNotFoundError(f"{location} doesn't exist in the pak")
+
+        return self.__record(low, ignore_case)
+
+    def get_files(self) -> List[EtFile]:
+        """
+        :return: EtFile objects that read their data from the PAK, in
+        the order of the file information table
+        :rtype: List[EtFile]
+        """
+
+        locations = self.__mmap[self.__locations:]
+        records = self.__mmap[_HEADER_SIZE:self.__folded]
+
+        files: List[Optional[EtFile]] = [None] * self.__file_count
+        for (start, length, filesizecomp, filesize, alloc_size, offset,
+             checksum, position) in struct.iter_unpack(_RECORD_FORMAT,
+                                                       records):
+            # The location is already sanitized
+            file = EtFile()
+            file.set_file_info(
+                filesizecomp=filesizecomp,
+                filesize=filesize,
+                alloc_size=alloc_size,
+                offset=offset,
+                location=locations[start:start + length].decode("utf-8"),
+                checksum=checksum)
+            self.__attach(file)
+            files[position] = file
+
+        return files
+
+    def close(self):
+        """
+        Close the index
+        """
+
+        if self.__mmap is not None:
+            self.__mmap.close()
+            self.__mmap = None
+        if self.__handle is not None:
+            self.__handle.close()
+            self.__handle = None
+        if self.__pak is not None:
+            self.__pak.close()
+            self.__pak = None
+            self.__source = None
+            self.__lock = None
+
+    def __attach(self, file: EtFile):
+        """
+        Point a file to the PAK, it's opened on the first call
+        if no source was specified
+        """
+
+        if self.__source is None:
+            self.__pak = self.__source = open(self.__file_name, "rb")
+            self.__lock = threading.Lock()
+
+        if isinstance(self.__source, mmap.mmap):
+            file.set_source(self.__source)
+        else:
+            file.set_source(self.__source, self.__lock)
+
+    def __open(self, stamp: Tuple[int, int, int]) -> bool:
+        """
+        Map the index if it's up to date with the PAK
+
+        :param stamp: PAK size, modification time and file
+        information offset
+        :type stamp: Tuple[int, int, int]
+
+        :return: Whether the index is mapped
+        :rtype: bool
+        """
+
+        self.close()
+        try:
+            self.__handle = open(self.__index_file_name, "rb")
+            header = self.__handle.read(_HEADER_SIZE)
+        except FileNotFoundError:
+            return False
+
+        if len(header) < _HEADER_SIZE:
+            return False
+
+        (magic, size, mtime, file_offset, self.__file_count,
+         locations_size) = struct.unpack(_HEADER_FORMAT, header)
+        if magic != _MAGIC or (size, mtime, file_offset) != stamp:
+            return False
+
+        self.__folded = _HEADER_SIZE + self.__file_count * _RECORD_SIZE
+        self.__locations = self.__folded + self.__file_count * 4
+        expected = self.__locations + locations_size
+        if os.fstat(self.__handle.fileno()).st_size != expected:
+            return False
+
+        self.__mmap = mmap.mmap(self.__handle.fileno(), 0,
+                                access=mmap.ACCESS_READ)
+        return True
+
+    def __record(self, i: int, ignore_case: bool) -> int:
+        """
+        :return: Position of the i-th record in location order, or
+        case-folded location order
+        :rtype: int
+        """
+
+        if not ignore_case:
+            return i
+
+        position = self.__folded + i * 4
+        return struct.unpack_from("<I", self.__mmap, position)[0]
+
+    def __key(self, i: int, ignore_case: bool) -> str:
+        """
+        :return: Normalized location of the i-th record in location
+        order, or case-folded location order
+        :rtype: str
+        """
+
+        record = self.__record(i, ignore_case)
+        start, length = struct.unpack_from(
+            "<II", self.__mmap, _HEADER_SIZE + record * _RECORD_SIZE)
+        start += self.__locations
+        key = utils.normalize_location(
+            self.__mmap[start:start + length].decode("utf-8"))
+        return key.casefold() if ignore_case else key
+
+    def __file(self, record: int) -> Tuple[EtFile, int]:
+        """
+        :return: EtFile object of a record, and its position in
+        the file information table
+        :rtype: Tuple[EtFile, int]
+        """
+
+        (start, length, filesizecomp, filesize, alloc_size, offset, checksum,
+         position) = struct.unpack_from(_RECORD_FORMAT, self.__mmap,
+                                        _HEADER_SIZE + record * _RECORD_SIZE)
+        start += self.__locations
+
+        file = EtFile()
+        file.set_file_info(
+            filesizecomp=filesizecomp,
+            filesize=filesize,
+            alloc_size=alloc_size,
+            offset=offset,
+            location=self.__mmap[start:start + length].decode("utf-8"),
+            checksum=checksum)
+        return file, position
+
+
+def _stamp(file_name: str) -> Tuple[int, int, int]:
+    """
+    :return: PAK size, modification time and file information offset,
+    the index is rebuilt when they change
+    :rtype: Tuple[int, int, int]
+    """
+
+    stat = os.stat(file_name)
+    with open(file_name, "rb") as handle:
+        handle.seek(264)
+        file_offset = struct.unpack("<I", handle.read(4))[0]
+
+    return stat.st_size, stat.st_mtime_ns, file_offset
@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Optional
+
+# Counters reported by EtFileSystem and EtFile
+BYTES_READ = "bytes_read"
+BYTES_WRITTEN = "bytes_written"
+SEEKS = "seeks"
+ENTRIES_READ = "entries_read"
+ENTRIES_ADDED = "entries_added"
+ENTRIES_EXTRACTED = "entries_extracted"
+
+# Timers, in seconds
+READ_SECONDS = "read_seconds"
+WRITE_SECONDS = "write_seconds"
+COMPRESS_SECONDS = "compress_seconds"
+DECOMPRESS_SECONDS = "decompress_seconds"
+MKDIR_SECONDS = "mkdir_seconds"
+
+# Called with the number of files done, the total and the location
+# of the last file
+ProgressCallback = Callable[[int, int, str], None]
+
+_NO_TIMER = nullcontext()
+
+
+class Metrics:
+    def __init__(self):
+        """
+        In-memory collector of counters and timers. Override add to
+        send the values somewhere else, every value goes through it
+        """
+
+        self.__lock = threading.Lock()
+        self.__values: Dict[str, float] = {}
+
+    def __repr__(self):
+        return str(self.get_stats())
+
+    def add(self, name: str, value: float = 1):
+        """
+        Add to a counter
+
+        :param name: Name of the counter, e.g. BYTES_READ
+        :type name: str
+
+        :param value: Amount to add
+        :type value: float
+        """
+
+        with self.__lock:
+            self.__values[name] = self.__values.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        Add the time spent inside the with block to a timer
+
+        :param name: Name of the timer, e.g. COMPRESS_SECONDS
+        :type name: str
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        :return: Every counter and timer by name
+        :rtype: Dict[str, float]
+        """
+
+        with self.__lock:
+            return dict(self.__values)
+
+    def reset(self):
+        """
+        Set every counter and timer back to 0
+        """
+
+        with self.__lock:
+            self.__values.clear()
+
+
+def count(metrics: Optional[Metrics], name: str, value: float = 1):
+    """
+    Add to a counter of metrics, nothing happens if metrics is None
+    """
+
+    if metrics is not None:
+        metrics.add(name, value)
+
+
+def measure(metrics: Optional[Metrics], name: str):
+    """
+    Timer of metrics, or a context manager that does nothing if
+    metrics is None
+    """
+
+    return metrics.timer(name) if metrics is not None else _NO_TIMER
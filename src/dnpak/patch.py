@@ -0,0 +1,328 @@
+import mmap
+import os
+import shutil
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+from .etfile import EtFile
+from .etfilesystem import STREAM_CHUNK_SIZE, EtFileSystem, _read_file_table
+from . import utils
+
+# Entry of a patch with the locations it removes, one per line
+TOMBSTONE_LOCATION = "\\.dnpak_tombstones"
+
+
+def diff_paks(old_file_name: str, new_file_name: str) -> Dict[str, List[str]]:
+    """
+    Compare two PAKs file by file
+
+    :param old_file_name: PAK file name of the old version
+    :type old_file_name: str
+
+    :param new_file_name: PAK file name of the new version
+    :type new_file_name: str
+
+    :return: Locations that are added, changed and removed in the
+    new version
+    :rtype: Dict[str, List[str]]
+    """
+
+    with open(old_file_name, "rb") as old, open(new_file_name, "rb") as new:
+        added, changed, removed = _diff(old, _read_file_table(old),
+                                        new, _read_file_table(new))
+
+    return _summary(added, changed, removed)
+
+
+def create_patch(old_file_name: str, new_file_name: str,
+                 patch_file_name: str) -> Dict[str, List[str]]:
+    """
+    Write a patch PAK with the added and changed files of the new
+    version, and the locations removed from the old one. The compressed
+    data is copied as it is
+
+    :param old_file_name: PAK file name of the old version
+    :type old_file_name: str
+
+    :param new_file_name: PAK file name of the new version
+    :type new_file_name: str
+
+    :param patch_file_name: PAK file name to write the patch to
+    :type patch_file_name: str
+
+    :return: Locations that are added, changed and removed in the
+    new version
+    :rtype: Dict[str, List[str]]
+    """
+
+    if os.path.exists(patch_file_name):
+        raise FileExistsError("File already exists")
+
+    with open(old_file_name, "rb") as old, open(new_file_name, "rb") as new:
+        new_files = _read_file_table(new)
+        added, changed, removed = _diff(old, _read_file_table(old),
+                                        new, new_files)
+        patched = set(added) | set(changed)
+
+        layout = []
+        with open(patch_file_name, "wb") as out:
+            out.write(EtFileSystem._pack_header(0, 0))
+
+            # In the order of the new PAK
+            for file in new_files:
+                if file in patched:
+                    layout.append((file, out.tell()))
+                    _copy(new, out, file)
+
+            if removed:
+                data = "\n".join(f.get_location() for f in removed).encode(
+                    "utf-8")
+                tombstones = zlib.compress(data, 1)
+                tombstone = EtFile()
+                tombstone.set_file_info(filesizecomp=len(tombstones),
+                                        filesize=len(data),
+                                        location=TOMBSTONE_LOCATION,
+                                        checksum=zlib.crc32(tombstones))
+                layout.append((tombstone, out.tell()))
+                out.write(tombstones)
+
+            _write_table(out, layout)
+
+    return _summary(added, changed, removed)
+
+
+def apply_patch(file_name: str, patch_file_name: str,
+                output_file_name: str = None) -> Dict[str, List[str]]:
+    """
+    Merge a patch PAK into a PAK. The compressed data of the patch is
+    appended after the data of the PAK, and the other files stay
+    where they are
+
+    :param file_name: PAK file name to patch
+    :type file_name: str
+
+    :param patch_file_name: PAK file name of the patch, see create_patch
+    :type patch_file_name: str
+
+    :param output_file_name: PAK file name to write the patched PAK to,
+    the PAK itself is patched if not specified
+    :type output_file_name: str
+
+    :return: Locations that are added, changed and removed
+    :rtype: Dict[str, List[str]]
+    """
+
+    if output_file_name is not None:
+        if os.path.exists(output_file_name):
+            raise FileExistsError("File already exists")
+        shutil.copyfile(file_name, output_file_name)
+        file_name = output_file_name
+
+    with open(patch_file_name, "rb") as patch, open(file_name, "rb+") as out:
+        tombstones = set()
+        patch_files = {}
+        for file in _read_file_table(patch):
+            key = utils.normalize_location(file.get_location())
+            if key == TOMBSTONE_LOCATION:
+                file.load_from(patch)
+                tombstones = {
+                    utils.normalize_location(location) for location in
+                    file.get_decompressed_data().decode("utf-8").split("\n")
+                }
+            else:
+                patch_files.setdefault(key, file)
+
+        files = _read_file_table(out)
+
+        # The old file information stays valid until the new one is
+        # written, so the PAK can be read if patching is interrupted
+        out.seek(260)
+        file_count, file_offset = struct.unpack("<II", out.read(8))
+        end = max(1024, file_offset + file_count * 316)
+        for file in files:
+            if file.get_offset() > 0:
+                end = max(end, file.get_offset() + file.get_alloc_size())
+
+        out.seek(end)
+        offsets = {}
+        for key, file in patch_files.items():
+            offsets[key] = out.tell()
+            _copy(patch, out, file)
+
+        layout = []
+        added, changed, removed = [], [], []
+        found = set()
+        for file in files:
+            key = utils.normalize_location(file.get_location())
+            if key in patch_files:
+                if key not in found:
+                    changed.append(patch_files[key])
+                found.add(key)
+                file = patch_files[key]
+                layout.append((file, offsets[key]))
+            elif key in tombstones:
+                removed.append(file)
+            else:
+                layout.append((file, file.get_offset()))
+
+        for key, file in patch_files.items():
+            if key not in found:
+                added.append(file)
+                layout.append((file, offsets[key]))
+
+        _write_table(out, layout)
+        out.truncate()
+
+    try:
+        os.remove(utils.index_file_name(file_name))
+    except FileNotFoundError:
+        pass
+
+    return _summary(added, changed, removed)
+
+
+def _diff(old, old_table: List[EtFile], new, new_table: List[EtFile]
+          ) -> Tuple[List[EtFile], List[EtFile], List[EtFile]]:
+    """
+    Compare two PAKs, files whose size differs are changed without
+    reading them, and files with the same checksum are the same. Then
+    the compressed data is compared, and only when it differs the
+    decompressed data is
+
+    :param old: Binary file object of the old PAK
+    :type old: BinaryIO
+
+    :param old_table: Files of the old PAK
+    :type old_table: List[EtFile]
+
+    :param new: Binary file object of the new PAK
+    :type new: BinaryIO
+
+    :param new_table: Files of the new PAK
+    :type new_table: List[EtFile]
+
+    :return: Added, changed and removed files
+    :rtype: Tuple[List[EtFile], List[EtFile], List[EtFile]]
+    """
+
+    old_files = {}
+    for file in old_table:
+        old_files.setdefault(utils.normalize_location(file.get_location()),
+                             file)
+
+    new_files = {}
+    for file in new_table:
+        new_files.setdefault(utils.normalize_location(file.get_location()),
+                             file)
+
+    added, changed = [], []
+    with mmap.mmap(old.fileno(), 0, access=mmap.ACCESS_READ) as old_map, \
+            mmap.mmap(new.fileno(), 0, access=mmap.ACCESS_READ) as new_map:
+        for key, new_file in new_files.items():
+            old_file = old_files.get(key)
+            if old_file is None:
+                added.append(new_file)
+            elif not _same(old_file, old_map, new_file, new_map):
+                changed.append(new_file)
+
+    removed = [file for key, file in old_files.items()
+               if key not in new_files]
+
+    return added, changed, removed
+
+
+def _same(old_file: EtFile, old_map: mmap.mmap,
+          new_file: EtFile, new_map: mmap.mmap) -> bool:
+    """
+    :return: Whether the files have the same decompressed data
+    :rtype: bool
+    """
+
+    if old_file.get_file_size() != new_file.get_file_size():
+        return False
+
+    # A checksum of 0 isn't known
+    checksums = old_file.get_checksum() and new_file.get_checksum()
+    if (checksums and old_file.get_checksum() == new_file.get_checksum()
+            and old_file.get_compressed_file_size() ==
+            new_file.get_compressed_file_size()):
+        return True
+
+    old_data = old_map[old_file.get_offset():old_file.get_offset() +
+                       old_file.get_compressed_file_size()]
+    new_data = new_map[new_file.get_offset():new_file.get_offset() +
+                       new_file.get_compressed_file_size()]
+    # Different checksums are different compressed data
+    if not checksums and old_data == new_data:
+        return True
+
+    # The same data can be compressed differently
+    try:
+        return zlib.decompress(old_data) == zlib.decompress(new_data)
+    except zlib.error:
+        return False
+
+
+def _copy(source, out, file: EtFile):
+    """
+    Copy the compressed data of a file from source to the current
+    position of out
+
+    :param source: Binary file object of the PAK the file is in
+    :type source: BinaryIO
+
+    :param out: Binary file object of the PAK being written
+    :type out: BinaryIO
+
+    :param file: EtFile object in source
+    :type file: EtFile
+    """
+
+    source.seek(file.get_offset())
+    remaining = file.get_compressed_file_size()
+    while remaining > 0:
+        chunk = source.read(min(STREAM_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        out.write(chunk)
+        remaining -= len(chunk)
+
+
+def _write_table(out, layout: List[Tuple[EtFile, int]]):
+    """
+    Write the file information at the current position of out, and
+    point the header to it once it's written
+
+    :param out: Binary file object of the PAK being written
+    :type out: BinaryIO
+
+    :param layout: Every file with the offset of its compressed data
+    :type layout: List[Tuple[EtFile, int]]
+    """
+
+    file_offset = out.tell()
+    for file, offset in layout:
+        moved = EtFile()
+        moved.set_file_info(filesizecomp=file.get_compressed_file_size(),
+                            filesize=file.get_file_size(),
+                            alloc_size=file.get_compressed_file_size(),
+                            offset=offset,
+                            location=file.get_location(),
+                            checksum=file.get_checksum())
+        out.write(moved.get_file_info())
+    out.flush()
+
+    end = out.tell()
+    out.seek(260)
+    out.write(struct.pack("<II", len(layout), file_offset))
+    out.seek(end)
+
+
+def _summary(added: List[EtFile], changed: List[EtFile],
+             removed: List[EtFile]) -> Dict[str, List[str]]:
+    return {
+        "added": [f.get_location() for f in added],
+        "changed": [f.get_location() for f in changed],
+        "removed": [f.get_location() for f in removed],
+    }
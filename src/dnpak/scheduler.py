@@ -0,0 +1,146 @@
+import mmap
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .etfile import EtFile
+from .metrics import BYTES_READ, READ_SECONDS, SEEKS, Metrics, count, measure
+
+BATCH_SIZE = 8 * 1024 * 1024
+
+# Reading over a gap this small is cheaper than seeking over it
+MAX_GAP = 64 * 1024
+
+
+def read_sorted(source, files: Iterable[EtFile], lock=None,
+                batch_size: int = BATCH_SIZE, max_gap: int = MAX_GAP,
+                reuse_buffer: bool = True, metrics: Optional[Metrics] = None
+                ) -> Iterator[Tuple[EtFile, Optional[memoryview]]]:
+    """
+    Read the compressed data of many files in offset order. Files close
+    to each other are read together with one sequential read into a
+    buffer, and every file gets a slice of it
+
+    :param source: Binary file object or memory map of the PAK
+    :type source: BinaryIO or mmap.mmap
+
+    :param files: EtFile objects of the PAK
+    :type files: Iterable[EtFile]
+
+    :param lock: Lock guarding seek and read on the shared handle
+    :type lock: threading.Lock
+
+    :param batch_size: Maximum size of one read, files bigger than
+    that aren't read
+    :type batch_size: int
+
+    :param max_gap: Maximum unused space between two files read together
+    :type max_gap: int
+
+    :param reuse_buffer: Read every batch into the same buffer, a slice
+    is then only valid until the next file is taken
+    :type reuse_buffer: bool
+
+    :param metrics: Collector of the read metrics
+    :type metrics: Metrics
+
+    :return: Every file with its compressed data, files already in
+    memory first. The data is None for files bigger than batch_size,
+    read them in chunks with EtFile.iter_chunks
+    :rtype: Iterator[Tuple[EtFile, Optional[memoryview]]]
+    """
+
+    # Offset, size and file, the sizes are only computed once
+    pending: List[Tuple[int, int, EtFile]] = []
+    for file in files:
+        # Like EtFile.get_file_info writes it
+        size = max(file.get_alloc_size(), file.get_compressed_file_size())
+        if file.is_loaded() or size == 0:
+            yield file, memoryview(file.get_compressed_data())
+        elif size > batch_size:
+            yield file, None
+        else:
+            pending.append((file.get_offset(), size, file))
+
+    pending.sort(key=lambda item: item[0])
+
+    if isinstance(source, mmap.mmap):
+        # Pages are read by the OS, in offset order they're read ahead
+        view = memoryview(source)
+        for offset, size, file in pending:
+            count(metrics, BYTES_READ, size)
+            yield file, view[offset:offset + size]
+        return
+
+    buffer = None
+    for start, end, batch in _batches(pending, batch_size, max_gap):
+        if buffer is None or not reuse_buffer:
+            buffer = bytearray(batch_size if reuse_buffer else end - start)
+        view = memoryview(buffer)[:end - start]
+
+        with measure(metrics, READ_SECONDS):
+            if lock is None:
+                size = _read_into(source, start, view)
+            else:
+                with lock:
+                    size = _read_into(source, start, view)
+
+        if metrics is not None:
+            metrics.add(SEEKS)
+            metrics.add(BYTES_READ, size)
+
+        for offset, file_size, file in batch:
+            position = offset - start
+            yield file, view[position:min(position + file_size, size)]
+
+
+def _batches(files: List[Tuple[int, int, EtFile]], batch_size: int,
+             max_gap: int
+             ) -> Iterator[Tuple[int, int, List[Tuple[int, int, EtFile]]]]:
+    """
+    Group files sorted by offset into ranges that are read at once
+
+    :param files: Offset, size and file of every file
+    :type files: List[Tuple[int, int, EtFile]]
+
+    :return: Start and end of every range, and the files in it
+    :rtype: Iterator[Tuple[int, int, List[Tuple[int, int, EtFile]]]]
+    """
+
+    batch: List[Tuple[int, int, EtFile]] = []
+    start = end = 0
+    for item in files:
+        offset, size, _ = item
+        # Files can share their compressed data, so ranges can overlap
+        file_end = max(end, offset + size)
+        if batch and (offset - end > max_gap
+                      or file_end - start > batch_size):
+            yield start, end, batch
+            batch = []
+
+        if not batch:
+            start = offset
+            file_end = offset + size
+        batch.append(item)
+        end = file_end
+
+    if batch:
+        yield start, end, batch
+
+
+def _read_into(source, position: int, view: memoryview) -> int:
+    """
+    Fill view with the data of source at position
+
+    :return: Number of bytes read, less than the size of view only
+    at the end of source
+    :rtype: int
+    """
+
+    source.seek(position)
+    size = 0
+    while size < len(view):
+        read = source.readinto(view[size:])
+        if not read:
+            break
+        size += read
+
+    return size
@@ -1,4 +1,10 @@
 import os
+import re
+from collections import deque
+from fnmatch import translate
+from typing import Callable, Iterable, Pattern, Union
+
+_INVALID_LOCATION_CHARACTERS = re.compile(r"[^\w/\\. -]")
 
 
 def to_unix_path(location: str) -> str:
@@ -7,3 +13,92 @@ def to_unix_path(location: str) -> str:
 
 def to_windows_path(location: str) -> str:
     return location.replace(os.sep, "\\")
+
+
+def sanitize_location(raw: bytes) -> str:
+    location = raw.split(b"\x00", 1)[0].decode("utf-8", "ignore")
+
+    # \w is what str.isalnum() accepts, and an underscore
+    return _INVALID_LOCATION_CHARACTERS.sub("", location)
+
+
+def bounded_submit(submit, items, limit: int):
+    """
+    Submit every item, keeping at most limit futures in flight
+
+    Yields (item, future) pairs in the same order as items
+    """
+
+    pending = deque()
+    for item in items:
+        pending.append((item, submit(item)))
+        if len(pending) >= limit:
+            yield pending.popleft()
+
+    while pending:
+        yield pending.popleft()
+
+
+def normalize_location(location: str) -> str:
+    """
+    Normalize a location inside pak to a single leading backslash
+    and single backslash separators
+    """
+
+    parts = location.replace("/", "\\").split("\\")
+    return "\\" + "\\".join(part for part in parts if part)
+
+
+def index_file_name(file_name: str) -> str:
+    """
+    File name of the sidecar index of a PAK, see PakIndex
+    """
+
+    return f"{file_name}.idx"
+
+
+def normalize_pattern(pattern: str) -> str:
+    """
+    Normalize a glob pattern like a location, a pattern ending
+    with a separator matches everything under that folder
+    """
+
+    key = normalize_location(pattern)
+    if pattern[-1:] in ("/", "\\"):
+        key = key.rstrip("\\") + "\\*"
+    return key
+
+
+def location_filter(patterns: Union[str, Pattern, Iterable[Union[str, Pattern]]],
+                    ignore_case: bool = False) -> Callable[[str], bool]:
+    """
+    Build a function that tells whether a normalized location matches
+    any of the glob patterns or compiled regular expressions
+
+    Glob patterns are matched against the whole location, regular
+    expressions are searched anywhere in it
+    """
+
+    if isinstance(patterns, (str, Pattern)):
+        patterns = [patterns]
+
+    globs = []
+    regexes = []
+    for pattern in patterns:
+        if isinstance(pattern, str):
+            pattern = normalize_pattern(pattern)
+            globs.append(translate(pattern.casefold() if ignore_case
+                                   else pattern))
+        else:
+            regexes.append(pattern)
+
+    # Every glob in one regular expression, one match per location
+    glob_regex = re.compile("|".join(globs)) if globs else None
+
+    def match(location: str) -> bool:
+        if glob_regex is not None and glob_regex.match(
+                location.casefold() if ignore_case else location):
+            return True
+        return any(regex.search(location) for regex in regexes)
+
+    return match
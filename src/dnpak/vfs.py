@@ -0,0 +1,182 @@
+import io
+import mmap
+import threading
+from typing import Dict, List
+
+from .etfile import EtFile
+from .etfilesystem import _read_file_table
+from . import utils
+
+
+class PakVFS:
+    def __init__(self, file_names: List[str], use_mmap: bool = True):
+        """
+        Read-only view of several PAKs as one file system, a file in a
+        later PAK overrides the same location in an earlier one. Only
+        the file information is read, like the game locations are
+        matched case-insensitively
+
+        :param file_names: PAK file names, in load order
+        :type file_names: List[str]
+
+        :param use_mmap: Memory-map the PAKs instead of reading them
+        through file handles
+        :type use_mmap: bool
+        """
+
+        self.__file_names = list(file_names)
+        self.__handles = []
+        self.__maps = []
+
+        # Normalized, case-folded location -> EtFile
+        self.__index: Dict[str, EtFile] = {}
+        # Case-folded folder -> case-folded name -> name
+        self.__folders: Dict[str, Dict[str, str]] = {}
+
+        try:
+            for file_name in self.__file_names:
+                self.__load(file_name, use_mmap)
+        except BaseException:
+            self.close()
+            raise
+
+    def __repr__(self):
+        return str({
+            "paks": self.__file_names,
+            "file_count": len(self.__index),
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __load(self, file_name: str, use_mmap: bool):
+        """
+        Add the files of the specified PAK on top of the index
+
+        :param file_name: PAK file name to read
+        :type file_name: str
+
+        :param use_mmap: Memory-map the PAK
+        :type use_mmap: bool
+        """
+
+        handle = open(file_name, "rb")
+        self.__handles.append(handle)
+
+        files = _read_file_table(handle)
+
+        if use_mmap:
+            source = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__maps.append(source)
+            for file in files:
+                file.set_source(source)
+        else:
+            lock = threading.Lock()
+            for file in files:
+                file.set_source(handle, lock)
+
+        for file in files:
+            location = utils.normalize_location(file.get_location())
+            self.__index[location.casefold()] = file
+
+            # Every folder up to the root lists its child
+            while location != "\\":
+                folder, _, name = location.rpartition("\\")
+                folder = folder or "\\"
+                self.__folders.setdefault(folder.casefold(), {}).setdefault(
+                    name.casefold(), name)
+                location = folder
+
+    def find_file(self, location: str) -> EtFile:
+        """
+        :param location: Location of the file, either separator can be used
+        :type location: str
+
+        :return: EtFile object of the last PAK that has the location
+        :rtype: EtFile
+        """
+
+        try:
+            return self.__index[utils.normalize_location(location).casefold()]
+        except KeyError:
+            raise FileNotFoundError(
+                f"{location} doesn't exist in any pak") from None
+
+    def exists(self, location: str) -> bool:
+        """
+        :param location: Location of the file, either separator can be used
+        :type location: str
+
+        :return: Whether any PAK has the location
+        :rtype: bool
+        """
+
+        return utils.normalize_location(location).casefold() in self.__index
+
+    def read(self, location: str) -> bytes:
+        """
+        :param location: Location of the file, either separator can be used
+        :type location: str
+
+        :return: Decompressed data of the file
+        :rtype: bytes
+        """
+
+        return self.find_file(location).get_decompressed_data()
+
+    def open(self, location: str) -> io.BufferedReader:
+        """
+        :param location: Location of the file, either separator can be used
+        :type location: str
+
+        :return: Readable binary stream of the decompressed data
+        :rtype: io.BufferedReader
+        """
+
+        return self.find_file(location).open()
+
+    def listdir(self, folder: str = "\\") -> List[str]:
+        """
+        :param folder: Location of the folder, either separator can be used
+        :type folder: str
+
+        :return: Names of the files and folders directly in the folder
+        :rtype: List[str]
+        """
+
+        children = self.__folders.get(
+            utils.normalize_location(folder).casefold())
+        if children is None:
+            raise FileNotFoundError(f"{folder} doesn't exist in any pak")
+
+        return sorted(children.values())
+
+    def get_files(self) -> List[EtFile]:
+        """
+        :return: EtFile object of every location, after overrides
+        :rtype: List[EtFile]
+        """
+
+        return list(self.__index.values())
+
+    def close(self):
+        """
+        Close every PAK
+        """
+
+        for source in self.__maps:
+            try:
+                source.close()
+            except BufferError:
+                # A memoryview of the map is still alive somewhere,
+                # the map is closed when it's garbage collected
+                pass
+
+        for handle in self.__handles:
+            handle.close()
+
+        self.__maps.clear()
+        self.__handles.clear()
@@ -0,0 +1,10 @@
+import pytest
+
+from src.dnpak.etfilesystem import EtFileSystem
+
+
+@pytest.fixture(autouse=True)
+def clear_files():
+    # Files are shared between EtFileSystem instances, don't let
+    # a test that doesn't close its PAK leak into the next one
+    EtFileSystem._EtFileSystem__files.clear()
@@ -0,0 +1,90 @@
+import asyncio
+
+from src.dnpak.async_etfilesystem import AsyncEtFileSystem
+from src.dnpak.etfilesystem import EtFileSystem
+from src.dnpak.metrics import DECOMPRESS_SECONDS, Metrics
+
+file_list = [
+    {
+        "path": "tests/test_etfilesystem/resource/etc/freeze.msh",
+        "location": "/resource/etc/freeze.msh",
+    },
+    {
+        "path": "tests/test_etfilesystem/resource/etc/freeze.skn",
+        "location": "/resource/etc/freeze.skn",
+    },
+]
+
+
+def create_pak(tmp_path):
+    pak = EtFileSystem.write(f"{tmp_path}/pak1.test.pak")
+    for file in file_list:
+        pak.add_file(file["path"], file["location"])
+
+    pak.close_file_system()
+
+
+def read_files():
+    files = []
+    for file in file_list:
+        with open(file["path"], "rb") as f:
+            files.append(f.read())
+
+    return files
+
+
+def test_read_entry(tmp_path):
+    create_pak(tmp_path)
+
+    async def main():
+        async with await AsyncEtFileSystem.read(
+                f"{tmp_path}/pak1.test.pak") as pak:
+            return [await pak.read_entry(file["location"])
+                    for file in file_list]
+
+    assert asyncio.run(main()) == read_files()
+
+
+def test_iter_entries(tmp_path):
+    create_pak(tmp_path)
+
+    async def main():
+        async with await AsyncEtFileSystem.read(f"{tmp_path}/pak1.test.pak",
+                                                use_mmap=True) as pak:
+            return [data async for _, data in pak.iter_entries(prefetch=1)]
+
+    assert asyncio.run(main()) == read_files()
+
+
+def test_iter_entries_metrics_cache(tmp_path):
+    create_pak(tmp_path)
+    metrics = Metrics()
+
+    async def main():
+        async with await AsyncEtFileSystem.read(f"{tmp_path}/pak1.test.pak",
+                                                lazy=True,
+                                                metrics=metrics) as pak:
+            cache = pak.get_file_system().enable_cache(1024 ** 2)
+            first = [data async for _, data in pak.iter_entries()]
+            second = [data async for _, data in pak.iter_entries()]
+            return first, second, cache.get_stats()
+
+    first, second, stats = asyncio.run(main())
+    assert first == second == read_files()
+    assert stats["hits"] == len(file_list)
+    assert metrics.get_stats()[DECOMPRESS_SECONDS] > 0
+
+
+def test_extract(tmp_path):
+    create_pak(tmp_path)
+    directory = f"{tmp_path}/async.test"
+
+    async def main():
+        async with await AsyncEtFileSystem.read(
+                f"{tmp_path}/pak1.test.pak") as pak:
+            return await pak.extract(directory=directory, limit=2)
+
+    assert asyncio.run(main()) == {}
+    for file, data in zip(file_list, read_files()):
+        with open(f"{directory}{file['location']}", "rb") as f:
+            assert f.read() == data
@@ -0,0 +1,109 @@
+import os
+
+from src.dnpak.cache import CompressionCache, DecompressedCache
+from src.dnpak.etfilesystem import EtFileSystem
+
+
+def test_get_put(tmp_path):
+    source = tmp_path / "source.txt"
+    source.write_bytes(b"data")
+
+    cache = CompressionCache(str(tmp_path / "cache"))
+    assert cache.get(str(source)) is None
+
+    cache.put(str(source), b"compressed")
+    assert cache.get(str(source)) == b"compressed"
+    assert cache.get(str(source), level=9) is None
+
+    # A new cache on the same directory sees the entries
+    assert CompressionCache(str(tmp_path / "cache")).get(
+        str(source)) == b"compressed"
+
+    # Changing the source file misses the cache
+    source.write_bytes(b"other data")
+    assert cache.get(str(source)) is None
+
+
+def test_evict(tmp_path):
+    sources = []
+    for i in range(3):
+        source = tmp_path / f"{i}.txt"
+        source.write_bytes(b"data")
+        sources.append(str(source))
+
+    cache = CompressionCache(str(tmp_path / "cache"), max_size=20)
+    cache.put(sources[0], b"0" * 10)
+    cache.put(sources[1], b"1" * 10)
+    # 0 is used more recently than 1 now
+    assert cache.get(sources[0]) is not None
+
+    cache.put(sources[2], b"2" * 10)
+    assert cache.get(sources[1]) is None
+    assert cache.get(sources[0]) == b"0" * 10
+    assert cache.get(sources[2]) == b"2" * 10
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+
+def test_write_cache(tmp_path):
+    cache = CompressionCache(str(tmp_path / "cache"))
+
+    for name in ("first", "second"):
+        pak = EtFileSystem.write(f"{tmp_path}/{name}.test.pak", cache=cache)
+        pak.add_files("tests/test_etfilesystem")
+        pak.close_file_system()
+
+    assert len(os.listdir(tmp_path / "cache")) == 3
+    with open(f"{tmp_path}/first.test.pak", "rb") as first, \
+            open(f"{tmp_path}/second.test.pak", "rb") as second:
+        assert first.read() == second.read()
+
+
+def test_decompressed_cache():
+    cache = DecompressedCache(max_size=10)
+    assert cache.get("a") is None
+
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+
+    # b is the least recently used
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("c") == b"cccc"
+
+    # Bigger than the whole budget
+    cache.put("d", b"d" * 11)
+    assert cache.get("d") is None
+
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    assert cache.get_stats() == {
+        "hits": 2,
+        "misses": 4,
+        "evictions": 1,
+        "entries": 1,
+        "size": 4,
+        "max_size": 10,
+    }
+
+
+def test_read_decompressed_cache(tmp_path):
+    pak = EtFileSystem.write(f"{tmp_path}/cache.test.pak")
+    pak.add_file("tests/test_etfilesystem/test.txt", "\\test.txt")
+    pak.close_file_system()
+
+    pak = EtFileSystem.read(f"{tmp_path}/cache.test.pak", lazy=True)
+    cache = pak.enable_cache(1024)
+    test_txt = pak.find_file("\\test.txt")
+
+    assert pak.get_decompressed_data(test_txt) == b"test"
+    assert pak.get_decompressed_data(test_txt) == b"test"
+    assert cache.get_stats()["hits"] == 1
+
+    pak.edit_file(test_txt, b"edited")
+    assert pak.get_decompressed_data(test_txt) == b"edited"
+    assert cache.get_stats()["misses"] == 2
+
+    pak.close_file_system()
+    assert len(cache) == 0
@@ -0,0 +1,156 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.dnpak.cli import main
+from src.dnpak.etfilesystem import EtFileSystem
+
+FILES = {
+    "resource/etc/a.txt": b"a" * 1000,
+    "resource/etc/b.dds": b"b" * 1000,
+    "test.txt": b"test",
+}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "files"
+    for location, data in FILES.items():
+        path = folder / location
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return str(folder)
+
+
+@pytest.fixture
+def pak(tmp_path, folder):
+    file_name = str(tmp_path / "test.pak")
+    assert main(["pack", folder, file_name, "-q"]) == 0
+    return file_name
+
+
+def test_pack(tmp_path, folder, capsys):
+    file_name = str(tmp_path / "jobs.pak")
+    assert main(["pack", folder, file_name, "-j", "2", "--dedup"]) == 0
+    assert "packed 3 files" in capsys.readouterr().err
+
+    pak = EtFileSystem.read(file_name)
+    files = {f.get_location(): f.get_decompressed_data()
+             for f in pak.get_files()}
+    pak.close_file_system()
+    assert sorted(files.values()) == sorted(FILES.values())
+
+
+def test_pack_existing(pak, folder, capsys):
+    assert main(["pack", folder, pak]) == 1
+    assert "already exists" in capsys.readouterr().err
+
+
+def test_pack_failed(tmp_path, folder, monkeypatch, capsys):
+    file_name = str(tmp_path / "failed.pak")
+    assert main(["pack", str(tmp_path / "missing"), file_name]) == 1
+    assert "isn't a folder" in capsys.readouterr().err
+    assert not os.path.exists(file_name)
+
+    def interrupt(*_, **__):
+        raise KeyboardInterrupt
+
+    # The partial PAK is removed, so the same command can run again
+    monkeypatch.setattr(EtFileSystem, "add_files", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        main(["pack", folder, file_name])
+    assert not os.path.exists(file_name)
+    monkeypatch.undo()
+
+    assert main(["pack", folder, file_name, "-q"]) == 0
+
+
+def test_unpack(tmp_path, pak):
+    output = tmp_path / "out"
+    assert main(["unpack", pak, "-o", str(output), "-j", "2",
+                 "-i", "*.TXT", "--ignore-case", "-x", "test.txt",
+                 "-q"]) == 0
+
+    assert (output / "resource" / "etc" / "a.txt").read_bytes() == b"a" * 1000
+    assert not (output / "resource" / "etc" / "b.dds").exists()
+    assert not (output / "test.txt").exists()
+
+
+def test_ls(pak, capsys):
+    assert main(["ls", pak, "-i", "resource/*"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert sorted(line.replace("\\", "/").lstrip("/") for line in lines) == [
+        "resource/etc/a.txt", "resource/etc/b.dds"]
+
+    assert main(["ls", pak, "-l", "-x", "resource/*"]) == 0
+    size, _, _, location = capsys.readouterr().out.split()
+    assert size == "4" and location.endswith("test.txt")
+
+
+def test_cat(pak, capfdbinary):
+    assert main(["cat", pak, "/RESOURCE/ETC/A.TXT", "--ignore-case"]) == 0
+    assert capfdbinary.readouterr().out == b"a" * 1000
+
+    assert main(["cat", pak, "missing.txt"]) == 1
+    assert b"doesn't exist" in capfdbinary.readouterr().err
+
+
+def test_verify(pak, capsys):
+    assert main(["verify", pak, pak, "-j", "2"]) == 0
+    assert "verified 6 files" in capsys.readouterr().err
+
+    # Flip a byte of the compressed data of the first file
+    with open(pak, "rb+") as f:
+        f.seek(1024)
+        byte = f.read(1)
+        f.seek(1024)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    assert main(["verify", pak]) == 1
+    assert "1 corrupt" in capsys.readouterr().err
+
+
+def test_diff(tmp_path, pak, folder, capsys):
+    with open(os.path.join(folder, "test.txt"), "wb") as f:
+        f.write(b"changed")
+    os.remove(os.path.join(folder, "resource", "etc", "b.dds"))
+    with open(os.path.join(folder, "new.txt"), "wb") as f:
+        f.write(b"new")
+    new = str(tmp_path / "new.pak")
+    assert main(["pack", folder, new, "-q"]) == 0
+
+    patch = str(tmp_path / "patch.pak")
+    assert main(["diff", pak, new, "--patch", patch]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert sorted(line[0] + line.replace("\\", "/").split("/")[-1]
+                  for line in lines) == ["Anew.txt", "Db.dds", "Mtest.txt"]
+    assert os.path.exists(patch)
+
+
+def test_no_command(capsys):
+    assert main([]) == 2
+    assert "usage" in capsys.readouterr().out
+
+
+def test_fast_import():
+    # What ls and cat import, the pools and asyncio aren't needed
+    code = ("import sys, src.dnpak.cli, src.dnpak.etfilesystem; "
+            "print(sorted(m for m in ('asyncio', 'concurrent.futures', "
+            "'multiprocessing') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert result.stdout.strip() == "[]"
+
+
+def test_lazy_exports():
+    import src.dnpak as dnpak
+
+    assert dnpak.EtFileSystem is EtFileSystem
+    # Submodules resolve like before the exports were lazy
+    assert dnpak.etfilesystem.EtFileSystem is EtFileSystem
+    assert callable(dnpak.utils.normalize_location)
+    with pytest.raises(AttributeError):
+        dnpak.missing
@@ -0,0 +1,56 @@
+import os
+import zlib
+
+from src.dnpak.compression import STORE, CompressionPolicy
+from src.dnpak.etfilesystem import EtFileSystem
+
+
+def test_default_policy():
+    data = b"dragon nest " * 1000
+    assert CompressionPolicy().compress(data, "\\a.txt") == zlib.compress(data, 1)
+
+
+def test_choose_pattern():
+    policy = CompressionPolicy.store_incompressible(
+        level=6, patterns={"\\sound\\*.wav": (9, zlib.Z_FILTERED)})
+
+    assert policy.choose("\\sound\\bgm.OGG") == (STORE, zlib.Z_DEFAULT_STRATEGY)
+    assert policy.choose("/sound/hit.wav") == (9, zlib.Z_FILTERED)
+    assert policy.choose("\\resource\\a.txt") == (6, zlib.Z_DEFAULT_STRATEGY)
+    # Textures still get smaller with zlib
+    assert policy.choose("\\resource\\a.dds") == (6, zlib.Z_DEFAULT_STRATEGY)
+
+
+def test_store_sample():
+    policy = CompressionPolicy(level=9, sample_size=4096)
+    random = os.urandom(8192)
+
+    assert policy.choose("\\a.bin", random)[0] == STORE
+    assert policy.choose("\\a.txt", b"a" * 8192)[0] == 9
+
+    filedatacomp = policy.compress(random, "\\a.bin")
+    # Stored blocks only add a few bytes
+    assert len(filedatacomp) < len(random) + 64
+    assert zlib.decompress(filedatacomp) == random
+
+
+def test_write_policy(tmp_path):
+    folder = tmp_path / "files"
+    folder.mkdir()
+    (folder / "music.ogg").write_bytes(b"a" * 4096)
+    (folder / "text.txt").write_bytes(b"a" * 4096)
+
+    for streaming in (False, True):
+        file_name = str(tmp_path / f"{streaming}.pak")
+        pak = EtFileSystem.write(file_name, streaming=streaming,
+                                 policy=CompressionPolicy.store_incompressible())
+        pak.add_files(str(folder))
+        pak.close_file_system()
+
+        pak = EtFileSystem.read(file_name)
+        music = pak.find_file("\\music.ogg")
+        text = pak.find_file("\\text.txt")
+        assert music.get_compressed_file_size() > 4096
+        assert text.get_compressed_file_size() < 4096
+        assert music.get_decompressed_data() == b"a" * 4096
+        pak.close_file_system()
@@ -55,3 +55,57 @@ def test_manual_compress():
 
         assert compressed == compressed_manual
 
+
+def test_iter_chunks():
+    for file in file_list:
+        with open(file["path"], "rb") as f:
+            data_before = f.read()
+        chunks = list(EtFile(file["path"], file["location"]).iter_chunks(256))
+
+        assert max(len(chunk) for chunk in chunks) <= 256
+        assert b"".join(chunks) == data_before
+
+
+def test_open():
+    for file in file_list:
+        with open(file["path"], "rb") as f:
+            data_before = f.read()
+
+        with EtFile(file["path"], file["location"]).open(512) as stream:
+            assert stream.read(10) == data_before[:10]
+            assert stream.read() == data_before[10:]
+
+
+def test_iter_chunks_truncated():
+    file = EtFile(file_list[0]["path"], file_list[0]["location"])
+    compressed = file.get_compressed_data()
+    file.set_file_info(filedatacomp=compressed[:len(compressed) // 2])
+
+    with pytest.raises(zlib.error):
+        list(file.iter_chunks())
+
+
+def test_slots():
+    file = EtFile(file_list[0]["path"], file_list[0]["location"])
+
+    assert not hasattr(file, "__dict__")
+    with pytest.raises(AttributeError):
+        file.unknown = 1
+
+
+def test_verify():
+    file = EtFile(file_list[0]["path"], file_list[0]["location"])
+    compressed = file.get_compressed_data()
+    assert file.get_checksum() == zlib.crc32(compressed)
+    file.verify(chunk_size=100)
+
+    file.set_file_info(filedatacomp=compressed[:-1] + b"\0")
+    with pytest.raises(ValueError):
+        file.verify()
+
+    # Without a checksum the data is decompressed
+    file.set_file_info(filedatacomp=compressed, checksum=0)
+    file.verify()
+    file.set_file_info(filedatacomp=compressed[:len(compressed) // 2])
+    with pytest.raises(zlib.error):
+        file.verify()
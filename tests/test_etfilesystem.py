@@ -1,4 +1,6 @@
 import os
+import re
+import struct
 
 import pytest
 
@@ -161,3 +163,486 @@ def test_edit_file(tmp_path):
         EtFile(location="\\test.txt").get_location()).get_decompressed_data()
 
     assert new_data == new_test_txt
+
+
+def test_read_lazy(tmp_path):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    assert pak.FILE_COUNT == 2
+
+    for file, etfile in zip(file_list, pak.get_files()):
+        with open(file["path"], "rb") as f:
+            assert etfile.get_decompressed_data() == f.read()
+
+    pak.close_file_system()
+
+
+def test_edit_file_lazy(tmp_path):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    pak.add_file("tests/test_etfilesystem/test.txt", "\\test.txt")
+    pak.close_file_system()
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    for file, etfile in zip(file_list, pak.get_files()):
+        with open(file["path"], "rb") as f:
+            assert etfile.get_decompressed_data() == f.read()
+
+    test_txt = pak.find_file("\\test.txt")
+    assert test_txt.get_decompressed_data() == b"test"
+    pak.close_file_system()
+
+
+def test_read_mmap(tmp_path):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", use_mmap=True)
+    assert pak.FILE_COUNT == 2
+
+    for file, etfile in zip(file_list, pak.get_files()):
+        with open(file["path"], "rb") as f:
+            assert etfile.get_decompressed_data() == f.read()
+
+        view = etfile.get_compressed_view()
+        assert isinstance(view, memoryview)
+        assert view == etfile.get_compressed_data()
+        view.release()
+
+    pak.close_file_system()
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_read_pak_extract_workers(tmp_path, use_processes):
+    create_pak(tmp_path)
+
+    directory = f"{tmp_path}/workers.test"
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    errors = pak.extract(directory=directory, workers=4,
+                         use_processes=use_processes)
+    assert errors == {}
+
+    for file in file_list:
+        with open(file["path"], "rb") as f:
+            before_pak = f.read()
+
+        with open(f"{directory}{file['location']}", "rb") as f:
+            after_pak = f.read()
+
+        assert before_pak == after_pak
+
+    pak.close_file_system()
+
+
+def test_read_pak_extract_errors(tmp_path):
+    create_pak(tmp_path)
+
+    directory = f"{tmp_path}/errors.test"
+    # A directory where the file should be makes open() fail
+    os.makedirs(f"{directory}/resource/etc/freeze.msh")
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak")
+    errors = pak.extract(directory=directory, workers=2)
+    pak.close_file_system()
+
+    assert len(errors) == 1
+    location, error = next(iter(errors.items()))
+    assert location.endswith("freeze.msh")
+    assert isinstance(error, OSError)
+    assert os.path.isfile(f"{directory}/resource/etc/freeze.skn")
+
+
+def test_read_pak_extract_filters(tmp_path):
+    pak = EtFileSystem.write(f"{tmp_path}/filters.test.pak")
+    pak.add_files("tests/test_etfilesystem")
+    pak.close_file_system()
+
+    def extracted(**filters):
+        directory = f"{tmp_path}/{len(os.listdir(tmp_path))}"
+        pak = EtFileSystem.read(f"{tmp_path}/filters.test.pak", lazy=True)
+        pak.extract(directory=directory, **filters)
+        pak.close_file_system()
+
+        return sorted(os.path.relpath(os.path.join(root, name), directory)
+                      for root, _, names in os.walk(directory)
+                      for name in names)
+
+    assert extracted(include="\\resource\\") == [
+        "resource/etc/freeze.msh", "resource/etc/freeze.skn"]
+    assert extracted(include=["/*.txt", "*.skn"]) == [
+        "resource/etc/freeze.skn", "test.txt"]
+    assert extracted(include="\\*.MSH", ignore_case=True) == [
+        "resource/etc/freeze.msh"]
+    assert extracted(exclude=re.compile(r"freeze")) == ["test.txt"]
+    assert extracted(include="\\resource\\",
+                     predicate=lambda f: f.get_location().endswith("msh")
+                     ) == ["resource/etc/freeze.msh"]
+    assert extracted(include="\\nothing\\") == []
+
+
+def test_read_pak_extract_filters_lazy(tmp_path):
+    create_pak(tmp_path)
+
+    # Only the data of the included file is read
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    skipped = pak.find_file("/resource/etc/freeze.msh")
+    skipped.set_source(None)
+    errors = pak.extract(directory=f"{tmp_path}/lazy.test",
+                         include="*.skn")
+    pak.close_file_system()
+
+    assert errors == {}
+    assert os.listdir(f"{tmp_path}/lazy.test/resource/etc") == ["freeze.skn"]
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"use_mmap": True}])
+def test_verify(tmp_path, options):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", **options)
+    for file in pak.get_files():
+        assert file.get_checksum() != 0
+    assert pak.verify() == {}
+    assert pak.verify(workers=2) == {}
+    offset = pak.find_file("/resource/etc/freeze.skn").get_offset()
+    pak.close_file_system()
+
+    # Corrupt the second file
+    with open(f"{tmp_path}/pak1.test.pak", "rb+") as f:
+        f.seek(offset + 10)
+        byte = f.read(1)
+        f.seek(offset + 10)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    progress = []
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", **options)
+    errors = pak.verify(workers=2, progress=lambda *args: progress.append(args))
+    pak.close_file_system()
+
+    assert len(errors) == 1
+    location, error = next(iter(errors.items()))
+    assert location.endswith("freeze.skn")
+    assert isinstance(error, ValueError)
+    assert len(progress) == 2
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"use_mmap": True}])
+def test_verify_empty(tmp_path, options):
+    create_pak(tmp_path)
+
+    # Turn the first entry into an empty one without checksum
+    with open(f"{tmp_path}/pak1.test.pak", "rb+") as f:
+        f.seek(264)
+        file_offset = struct.unpack("<I", f.read(4))[0]
+        f.seek(file_offset + 256)
+        f.write(struct.pack("<II", 0, 0))
+        f.seek(file_offset + 256 + 20)
+        f.write(struct.pack("<I", 0))
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", **options)
+    assert pak.get_files()[0].get_file_size() == 0
+    assert pak.verify() == {}
+    assert pak.verify(workers=2) == {}
+    pak.close_file_system()
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"use_mmap": True}])
+def test_get_many(tmp_path, options):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", **options)
+    pak.enable_cache(1024 ** 2)
+    files = pak.get_files()[::-1]
+    expected = [f.get_decompressed_data() for f in files]
+    assert pak.get_many(files) == expected
+    # From the cache
+    assert pak.get_many(files + files) == expected + expected
+    pak.close_file_system()
+
+
+def test_add_files_workers(tmp_path):
+    pak = EtFileSystem.write(f"{tmp_path}/serial.test.pak")
+    pak.add_files("tests/test_etfilesystem")
+    pak.close_file_system()
+
+    pak = EtFileSystem.write(f"{tmp_path}/workers.test.pak")
+    pak.add_files("tests/test_etfilesystem", workers=4)
+    pak.close_file_system()
+
+    with open(f"{tmp_path}/serial.test.pak", "rb") as serial, \
+            open(f"{tmp_path}/workers.test.pak", "rb") as workers:
+        assert serial.read() == workers.read()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_write_streaming(tmp_path, workers):
+    pak = EtFileSystem.write(f"{tmp_path}/buffered.test.pak")
+    pak.add_files("tests/test_etfilesystem")
+    pak.add_file("tests/test_etfilesystem/test.txt", "\\test2.txt")
+    pak.close_file_system()
+
+    pak = EtFileSystem.write(f"{tmp_path}/streaming.test.pak",
+                             streaming=True)
+    pak.add_files("tests/test_etfilesystem", workers=workers)
+
+    # Streamed files are read back from the PAK, and reading doesn't
+    # move where the next file is written
+    with open("tests/test_etfilesystem/test.txt", "rb") as f:
+        expected = f.read()
+    assert pak.find_file("\\test.txt").get_decompressed_data() == expected
+    assert pak.extract(directory=f"{tmp_path}/streaming") == {}
+    with open(f"{tmp_path}/streaming/test.txt", "rb") as f:
+        assert f.read() == expected
+
+    pak.add_file("tests/test_etfilesystem/test.txt", "\\test2.txt")
+    assert pak.find_file("\\test2.txt").get_decompressed_data() == expected
+    pak.close_file_system()
+
+    with open(f"{tmp_path}/buffered.test.pak", "rb") as buffered, \
+            open(f"{tmp_path}/streaming.test.pak", "rb") as streaming:
+        assert buffered.read() == streaming.read()
+
+
+def test_find_file_normalized(tmp_path):
+    pak = EtFileSystem.write(f"{tmp_path}/find.test.pak")
+    pak.add_files("tests/test_etfilesystem")
+
+    freeze_msh = pak.find_file("\\resource\\etc\\freeze.msh")
+    assert pak.find_file("/resource/etc/freeze.msh") is freeze_msh
+    assert pak.find_file("resource\\etc\\freeze.msh") is freeze_msh
+    assert pak.find_file("\\RESOURCE\\Etc\\freeze.MSH",
+                         ignore_case=True) is freeze_msh
+
+    with pytest.raises(FileNotFoundError):
+        pak.find_file("\\RESOURCE\\Etc\\freeze.MSH")
+
+    pak.add_file("tests/test_etfilesystem/test.txt", "\\resource\\new.txt")
+    assert pak.find_file("\\resource\\new.txt").get_file_size() == 4
+
+    pak.close_file_system()
+
+
+def test_find_files(tmp_path):
+    pak = EtFileSystem.write(f"{tmp_path}/find.test.pak")
+    pak.add_files("tests/test_etfilesystem")
+
+    assert [f.get_location() for f in pak.find_files("\\resource\\")] == [
+        "\\resource\\etc\\freeze.msh",
+        "\\resource\\etc\\freeze.skn",
+    ]
+    assert [f.get_location() for f in pak.find_files("/resource/*.skn")
+            ] == ["\\resource\\etc\\freeze.skn"]
+    assert len(pak.find_files("\\*.TXT", ignore_case=True)) == 1
+    assert len(pak.find_files("\\")) == 3
+    assert pak.find_files("\\resource\\ui\\") == []
+
+    pak.close_file_system()
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"use_mmap": True}])
+def test_read_iter_chunks(tmp_path, options):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", **options)
+    for file, etfile in zip(file_list, pak.get_files()):
+        with open(file["path"], "rb") as f:
+            assert b"".join(etfile.iter_chunks(100)) == f.read()
+
+    pak.close_file_system()
+
+
+def test_close_incremental(tmp_path):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    freeze_msh, freeze_skn = pak.get_files()
+    offset = freeze_msh.get_offset()
+    pak.edit_file(freeze_msh, b"fits in place")
+    pak.edit_file(freeze_skn, os.urandom(4096))
+    pak.add_file("tests/test_etfilesystem/test.txt", "\\test.txt")
+    pak.close_file_system(incremental=True)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak")
+    freeze_msh, freeze_skn, test_txt = pak.get_files()
+    assert pak.FILE_COUNT == 3
+    assert freeze_msh.get_offset() == offset
+    assert freeze_msh.get_decompressed_data() == b"fits in place"
+    assert len(freeze_skn.get_decompressed_data()) == 4096
+    assert freeze_skn.get_offset() > freeze_msh.get_offset()
+    assert test_txt.get_decompressed_data() == b"test"
+
+    pak.close_file_system()
+    assert os.path.getsize(f"{tmp_path}/pak1.test.pak") == (
+        pak._FILE_OFFSET + pak.FILE_COUNT * 316)
+
+
+@pytest.mark.parametrize("in_place", [False, True])
+def test_close_incremental_interrupted(tmp_path, monkeypatch, in_place):
+    create_pak(tmp_path)
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak")
+    expected = [f.get_decompressed_data() for f in pak.get_files()]
+    pak.close_file_system()
+
+    def interrupt(*_):
+        raise KeyboardInterrupt
+
+    # Stop after the data and the file information are written,
+    # before the header points to the new file information
+    monkeypatch.setattr(EtFileSystem, "_EtFileSystem__rewrite_header",
+                        interrupt)
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    if in_place:
+        pak.edit_file(pak.get_files()[0], b"fits in place")
+    pak.edit_file(pak.get_files()[1], os.urandom(4096))
+    pak.add_file("tests/test_etfilesystem/test.txt", "\\test.txt")
+    with pytest.raises(KeyboardInterrupt):
+        pak.close_file_system(incremental=True)
+    EtFileSystem._EtFileSystem__file.close()
+    EtFileSystem._EtFileSystem__files.clear()
+    monkeypatch.undo()
+
+    # The old file information is read, appended files don't touch it
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    freeze_msh, freeze_skn = pak.get_files()
+    assert freeze_skn.get_decompressed_data() == expected[1]
+    errors = pak.verify()
+    if in_place:
+        # The file written back to its place isn't recoverable, but
+        # its checksum tells
+        assert list(errors) == [freeze_msh.get_location()]
+        assert isinstance(errors[freeze_msh.get_location()], ValueError)
+    else:
+        assert errors == {}
+        assert freeze_msh.get_decompressed_data() == expected[0]
+    pak.close_file_system()
+
+
+def test_close_incremental_untouched(tmp_path):
+    create_pak(tmp_path)
+    with open(f"{tmp_path}/pak1.test.pak", "rb") as f:
+        before = f.read()
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    pak.edit_file(pak.get_files()[0], pak.get_files()[0].get_decompressed_data())
+    pak.close_file_system(incremental=True)
+
+    with open(f"{tmp_path}/pak1.test.pak", "rb") as f:
+        assert f.read() == before
+
+
+def test_compact(tmp_path):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    pak.edit_file(pak.get_files()[0], os.urandom(8192))
+    pak.close_file_system(incremental=True)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak", lazy=True)
+    fragmentation = pak.get_fragmentation()
+    assert fragmentation["wasted_size"] > 0
+    assert 0 < fragmentation["fragmentation"] < 1
+
+    expected = [f.get_decompressed_data() for f in pak.get_files()]
+    assert pak.compact() == fragmentation["wasted_size"]
+    assert pak.get_fragmentation()["wasted_size"] == 0
+    assert [f.get_decompressed_data() for f in pak.get_files()] == expected
+    pak.close_file_system()
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak")
+    assert [f.get_decompressed_data() for f in pak.get_files()] == expected
+    assert pak.get_fragmentation()["wasted_size"] == 0
+    pak.close_file_system()
+
+
+def test_compact_to_file(tmp_path):
+    create_pak(tmp_path)
+
+    pak = EtFileSystem.read(f"{tmp_path}/pak1.test.pak")
+    assert pak.compact(f"{tmp_path}/compact.test.pak") == 0
+    pak.close_file_system()
+
+    with open(f"{tmp_path}/pak1.test.pak", "rb") as before, \
+            open(f"{tmp_path}/compact.test.pak", "rb") as after:
+        assert before.read() == after.read()
+
+
+def create_duplicates(tmp_path):
+    folder = tmp_path / "duplicates"
+    (folder / "a").mkdir(parents=True)
+    (folder / "b").mkdir()
+    data = os.urandom(2048)
+    for name in ("a/1.bin", "a/2.bin", "b/1.bin"):
+        (folder / name).write_bytes(data)
+    (folder / "b/other.bin").write_bytes(os.urandom(2048))
+
+    return str(folder), data
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_write_dedup(tmp_path, streaming, workers):
+    folder, data = create_duplicates(tmp_path)
+
+    pak = EtFileSystem.write(f"{tmp_path}/dedup.test.pak",
+                             streaming=streaming, dedup=True)
+    pak.add_files(folder, workers=workers)
+    pak.add_file(f"{folder}/a/1.bin", "\\c\\1.bin")
+    pak.close_file_system()
+
+    pak = EtFileSystem.read(f"{tmp_path}/dedup.test.pak")
+    duplicates = [pak.find_file(location) for location in
+                  ("\\a\\1.bin", "\\a\\2.bin", "\\b\\1.bin", "\\c\\1.bin")]
+    assert len({f.get_offset() for f in duplicates}) == 1
+    for f in duplicates:
+        assert f.get_decompressed_data() == data
+
+    assert pak.find_file("\\b\\other.bin").get_offset() != duplicates[0].get_offset()
+    pak.close_file_system()
+
+    # The three copies of data are stored once
+    assert (os.path.getsize(f"{tmp_path}/dedup.test.pak") < 1024 + 2 * 2100 +
+            5 * 316)
+
+
+def test_write_dedup_edit(tmp_path):
+    folder, data = create_duplicates(tmp_path)
+
+    pak = EtFileSystem.write(f"{tmp_path}/dedup.test.pak", dedup=True)
+    pak.add_files(folder)
+    pak.edit_file(pak.find_file("\\a\\1.bin"), b"edited")
+    pak.close_file_system()
+
+    pak = EtFileSystem.read(f"{tmp_path}/dedup.test.pak")
+    assert pak.find_file("\\a\\1.bin").get_decompressed_data() == b"edited"
+    assert pak.find_file("\\a\\2.bin").get_decompressed_data() == data
+    assert pak.find_file("\\b\\1.bin").get_decompressed_data() == data
+
+    # Shared data isn't overwritten in place
+    pak.edit_file(pak.find_file("\\a\\2.bin"), b"edited again")
+    pak.close_file_system(incremental=True)
+
+    pak = EtFileSystem.read(f"{tmp_path}/dedup.test.pak")
+    assert pak.find_file("\\a\\2.bin").get_decompressed_data() == b"edited again"
+    assert pak.find_file("\\b\\1.bin").get_decompressed_data() == data
+    pak.close_file_system()
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"use_mmap": True}])
+def test_read_file_table(tmp_path, options):
+    folder = tmp_path / "many"
+    folder.mkdir()
+    for i in range(300):
+        (folder / f"file_{i:03}.txt").write_bytes(str(i).encode())
+    (folder / "odd?name*.txt").write_bytes(b"odd")
+
+    pak = EtFileSystem.write(f"{tmp_path}/many.test.pak")
+    pak.add_files(str(folder))
+    pak.close_file_system()
+
+    pak = EtFileSystem.read(f"{tmp_path}/many.test.pak", **options)
+    assert pak.FILE_COUNT == 301
+    assert pak.find_file("\\file_123.txt").get_decompressed_data() == b"123"
+    # Characters that aren't allowed in a location are removed
+    assert pak.find_file("\\oddname.txt").get_decompressed_data() == b"odd"
+    pak.close_file_system()
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from src.dnpak.etfilesystem import EtFileSystem
+from src.dnpak.index import PakIndex
+
+
+def create_pak(file_name, folder="tests/test_etfilesystem"):
+    pak = EtFileSystem.write(file_name)
+    pak.add_files(folder)
+    pak.close_file_system()
+
+
+def test_find_file(tmp_path):
+    file_name = f"{tmp_path}/index.pak"
+    create_pak(file_name)
+
+    with PakIndex(file_name) as index:
+        assert os.path.exists(f"{file_name}.idx")
+        assert len(index) == 3
+
+        file = index.find_file("/resource/etc/freeze.skn")
+        assert file.get_location() == "\\resource\\etc\\freeze.skn"
+        assert index.find_file("\\TEST.txt", ignore_case=True
+                               ).get_location() == "\\test.txt"
+
+        with pytest.raises(FileNotFoundError):
+            index.find_file("\\TEST.txt")
+        with pytest.raises(FileNotFoundError):
+            index.find_file("\\zzz")
+
+
+def test_find_file_data(tmp_path):
+    file_name = f"{tmp_path}/index.pak"
+    create_pak(file_name)
+
+    with open("tests/test_etfilesystem/resource/etc/freeze.skn", "rb") as f:
+        expected = f.read()
+
+    with PakIndex(file_name) as index:
+        file = index.find_file("/resource/etc/freeze.skn")
+        assert file.get_decompressed_data() == expected
+        assert b"".join(file.iter_chunks()) == expected
+        assert index.find_position("/resource/etc/freeze.skn") == 2
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"use_mmap": True}])
+def test_read_use_index_find_file(tmp_path, options):
+    file_name = f"{tmp_path}/index.pak"
+    create_pak(file_name)
+
+    with open("tests/test_etfilesystem/test.txt", "rb") as f:
+        expected = f.read()
+
+    pak = EtFileSystem.read(file_name, use_index=True, **options)
+    file = pak.find_file("\\TEST.TXT", ignore_case=True)
+    assert file is pak.get_files()[0]
+    assert file.get_decompressed_data() == expected
+
+    # Edited through the index lookup, and found after files are added
+    pak.edit_file(file, b"edited")
+    pak.add_file("tests/test_etfilesystem/test.txt", "/added.txt")
+    assert pak.find_file("\\test.txt").get_decompressed_data() == b"edited"
+    assert pak.find_file("\\added.txt").get_decompressed_data() == expected
+    pak.close_file_system()
+
+
+def test_read_use_index(tmp_path):
+    file_name = f"{tmp_path}/index.pak"
+    create_pak(file_name)
+
+    pak = EtFileSystem.read(file_name)
+    expected = [f.get_file_info() for f in pak.get_files()]
+    pak.close_file_system()
+
+    for _ in range(2):
+        pak = EtFileSystem.read(file_name, lazy=True, use_index=True)
+        assert [f.get_file_info() for f in pak.get_files()] == expected
+        assert pak.verify() == {}
+        pak.close_file_system()
+
+
+def test_stale_index(tmp_path):
+    file_name = f"{tmp_path}/index.pak"
+    create_pak(file_name)
+    PakIndex.build(file_name)
+
+    # Writing to the PAK removes the index
+    pak = EtFileSystem.read(file_name)
+    pak.edit_file(pak.find_file("\\test.txt"), b"edited")
+    pak.close_file_system()
+    assert not os.path.exists(f"{file_name}.idx")
+
+    # A PAK changed behind our back is noticed by its modification time
+    PakIndex.build(file_name)
+    pak = EtFileSystem.read(file_name, lazy=True)
+    file_offset = pak._FILE_OFFSET
+    pak.close_file_system()
+
+    stat = os.stat(file_name)
+    with open(file_name, "rb+") as f:
+        # Real Size of the first file
+        f.seek(file_offset + 260)
+        f.write((12345).to_bytes(4, "little"))
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    with PakIndex(file_name) as index:
+        assert index.get_files()[0].get_file_size() == 12345
+
+
+@pytest.mark.parametrize("options", [{"lazy": True}, {"use_mmap": True}])
+def test_read_use_index_unwritable(tmp_path, monkeypatch, options):
+    file_name = f"{tmp_path}/index.pak"
+    create_pak(file_name)
+
+    def unwritable(*_, **__):
+        raise PermissionError("Read-only folder")
+
+    # The table is read instead
+    monkeypatch.setattr("src.dnpak.index.tempfile.mkstemp", unwritable)
+    pak = EtFileSystem.read(file_name, use_index=True, **options)
+    assert not os.path.exists(f"{file_name}.idx")
+    assert len(pak.get_files()) == 3
+    assert pak.find_file("\\test.txt").get_decompressed_data() == b"test"
+    pak.close_file_system()
@@ -0,0 +1,80 @@
+import threading
+
+from src.dnpak import metrics
+from src.dnpak.etfilesystem import EtFileSystem
+from src.dnpak.metrics import Metrics
+
+
+def test_collector():
+    collector = Metrics()
+    collector.add(metrics.BYTES_READ, 10)
+    collector.add(metrics.BYTES_READ, 5)
+    with collector.timer(metrics.READ_SECONDS):
+        pass
+
+    stats = collector.get_stats()
+    assert stats[metrics.BYTES_READ] == 15
+    assert stats[metrics.READ_SECONDS] >= 0
+
+    collector.reset()
+    assert collector.get_stats() == {}
+
+    # Nothing happens without a collector
+    metrics.count(None, metrics.SEEKS)
+    with metrics.measure(None, metrics.READ_SECONDS):
+        pass
+
+
+def test_collector_threads():
+    collector = Metrics()
+
+    def add():
+        for _ in range(1000):
+            collector.add(metrics.SEEKS)
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert collector.get_stats()[metrics.SEEKS] == 4000
+
+
+def test_pak_metrics(tmp_path):
+    folder = tmp_path / "files"
+    folder.mkdir()
+    for i in range(3):
+        (folder / f"{i}.txt").write_bytes(b"a" * 1000)
+
+    collector = Metrics()
+    added = []
+    pak = EtFileSystem.write(str(tmp_path / "test.pak"), metrics=collector)
+    pak.add_files(str(folder), progress=lambda *args: added.append(args))
+    pak.close_file_system()
+
+    stats = collector.get_stats()
+    assert stats[metrics.ENTRIES_ADDED] == 3
+    assert stats[metrics.BYTES_READ] == 3000
+    assert stats[metrics.BYTES_WRITTEN] > 3 * 316
+    assert stats[metrics.COMPRESS_SECONDS] > 0
+    assert [(done, total) for done, total, _ in added] == [
+        (1, 3), (2, 3), (3, 3)]
+
+    for workers in (1, 2):
+        collector = Metrics()
+        extracted = []
+        pak = EtFileSystem.read(str(tmp_path / "test.pak"), lazy=True,
+                                metrics=collector)
+        pak.extract(directory=str(tmp_path / f"out{workers}"),
+                    workers=workers,
+                    progress=lambda *args: extracted.append(args))
+        pak.close_file_system()
+
+        stats = collector.get_stats()
+        assert stats[metrics.ENTRIES_READ] == 3
+        assert stats[metrics.ENTRIES_EXTRACTED] == 3
+        assert stats[metrics.BYTES_WRITTEN] == 3000
+        assert stats[metrics.DECOMPRESS_SECONDS] > 0
+        assert stats[metrics.SEEKS] >= 3
+        assert len(extracted) == 3
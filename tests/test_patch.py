@@ -0,0 +1,112 @@
+import os
+import zlib
+
+import pytest
+
+from src.dnpak.compression import CompressionPolicy
+from src.dnpak.etfilesystem import EtFileSystem
+from src.dnpak.patch import (TOMBSTONE_LOCATION, apply_patch, create_patch,
+                             diff_paks)
+from src.dnpak.vfs import PakVFS
+
+
+def write_pak(file_name, files, policy=None):
+    folder = f"{file_name}.files"
+    for location, data in files.items():
+        path = os.path.join(folder, location)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    pak = EtFileSystem.write(file_name, policy=policy)
+    pak.add_files(folder)
+    pak.close_file_system()
+
+
+def read_pak(file_name):
+    with PakVFS([file_name]) as vfs:
+        return {f.get_location(): vfs.read(f.get_location())
+                for f in vfs.get_files()}
+
+
+@pytest.fixture
+def paks(tmp_path):
+    old = str(tmp_path / "old.pak")
+    new = str(tmp_path / "new.pak")
+    write_pak(old, {
+        "same/a.txt": b"a" * 1000,
+        "same/b.txt": b"b" * 1000,
+        "changed.txt": b"old" * 100,
+        "removed.txt": b"removed",
+    })
+    write_pak(new, {
+        "same/a.txt": b"a" * 1000,
+        # Compressed differently, still the same data
+        "same/b.txt": b"b" * 1000,
+        "changed.txt": b"new" * 100,
+        "added.txt": b"added",
+    }, policy=CompressionPolicy(level=9))
+    return old, new
+
+
+def test_diff_paks(paks):
+    assert diff_paks(*paks) == {
+        "added": ["\\added.txt"],
+        "changed": ["\\changed.txt"],
+        "removed": ["\\removed.txt"],
+    }
+    assert diff_paks(paks[0], paks[0]) == {
+        "added": [], "changed": [], "removed": []}
+
+
+@pytest.mark.parametrize("in_place", [False, True])
+def test_create_apply_patch(tmp_path, paks, in_place):
+    old, new = paks
+    patch = str(tmp_path / "patch.pak")
+    create_patch(old, new, patch)
+
+    # Only the added and changed files, and the removed locations
+    patch_files = read_pak(patch)
+    assert sorted(patch_files) == sorted(["\\added.txt", "\\changed.txt",
+                                          TOMBSTONE_LOCATION])
+    assert patch_files[TOMBSTONE_LOCATION] == b"\\removed.txt"
+
+    with pytest.raises(FileExistsError):
+        create_patch(old, new, patch)
+
+    output = old if in_place else str(tmp_path / "patched.pak")
+    summary = apply_patch(old, patch, None if in_place else output)
+    assert summary == {
+        "added": ["\\added.txt"],
+        "changed": ["\\changed.txt"],
+        "removed": ["\\removed.txt"],
+    }
+
+    assert read_pak(output) == read_pak(new)
+    assert diff_paks(output, new) == {
+        "added": [], "changed": [], "removed": []}
+
+    # The patched PAK can be read and edited like any other
+    pak = EtFileSystem.read(output)
+    assert zlib.decompress(
+        pak.find_file("\\changed.txt").get_compressed_data()) == b"new" * 100
+    pak.close_file_system()
+
+
+def test_apply_patch_interrupted(tmp_path, paks, monkeypatch):
+    old, new = paks
+    patch = str(tmp_path / "patch.pak")
+    create_patch(old, new, patch)
+    expected = read_pak(old)
+
+    def interrupt(*_):
+        raise KeyboardInterrupt
+
+    # Stop after the data of the patch is copied, before the new
+    # file information is written
+    monkeypatch.setattr("src.dnpak.patch._write_table", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        apply_patch(old, patch)
+    monkeypatch.undo()
+
+    assert read_pak(old) == expected
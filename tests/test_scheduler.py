@@ -0,0 +1,64 @@
+import io
+import mmap
+
+from src.dnpak.etfile import EtFile
+from src.dnpak.metrics import BYTES_READ, SEEKS, Metrics
+from src.dnpak.scheduler import read_sorted
+
+DATA = bytes(range(256)) * 64
+
+
+def make_file(offset, size):
+    file = EtFile()
+    file.set_file_info(filesizecomp=size, alloc_size=size, offset=offset,
+                       location=f"\\{offset}")
+    return file
+
+
+def test_read_sorted():
+    files = [make_file(1000, 100), make_file(0, 100), make_file(100, 50),
+             make_file(8000, 10)]
+    loaded = EtFile()
+    loaded.set_file_info(filesizecomp=3, filedatacomp=b"abc")
+
+    metrics = Metrics()
+    results = [(file, bytes(data)) for file, data in read_sorted(
+        io.BytesIO(DATA), files + [loaded], max_gap=1000, metrics=metrics)]
+
+    # In memory first, then in offset order
+    assert [file for file, _ in results] == [
+        loaded, files[1], files[2], files[0], files[3]]
+    for file, data in results[1:]:
+        offset = file.get_offset()
+        assert data == DATA[offset:offset + file.get_compressed_file_size()]
+
+    # 0 to 1100 in one read, the last file is too far away
+    assert metrics.get_stats()[SEEKS] == 2
+    assert metrics.get_stats()[BYTES_READ] == 1110
+
+
+def test_read_sorted_batch_size():
+    files = [make_file(i * 100, 100) for i in range(10)] + [make_file(0, 500)]
+
+    metrics = Metrics()
+    results = list(read_sorted(io.BytesIO(DATA), files, batch_size=300,
+                               reuse_buffer=False, metrics=metrics))
+
+    # Too big to be read at once
+    assert results[0] == (files[-1], None)
+    assert [bytes(data) for _, data in results[1:]] == [
+        DATA[i * 100:i * 100 + 100] for i in range(10)]
+    assert metrics.get_stats()[SEEKS] == 4
+
+
+def test_read_sorted_mmap(tmp_path):
+    with open(tmp_path / "data", "wb") as f:
+        f.write(DATA)
+
+    files = [make_file(200, 10), make_file(100, 10)]
+    with open(tmp_path / "data", "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        results = [(file, bytes(data))
+                   for file, data in read_sorted(source, files)]
+
+    assert results == [(files[1], DATA[100:110]), (files[0], DATA[200:210])]
@@ -0,0 +1,59 @@
+import pytest
+
+from src.dnpak.etfilesystem import EtFileSystem
+from src.dnpak.vfs import PakVFS
+
+
+def create_paks(tmp_path):
+    base = tmp_path / "base"
+    (base / "resource" / "ui").mkdir(parents=True)
+    (base / "resource" / "ui" / "mainbar.ui").write_bytes(b"base mainbar")
+    (base / "resource" / "ui" / "inven.ui").write_bytes(b"base inven")
+    (base / "readme.txt").write_bytes(b"readme")
+
+    patch = tmp_path / "patch"
+    (patch / "Resource" / "UI").mkdir(parents=True)
+    (patch / "Resource" / "UI" / "MainBar.ui").write_bytes(b"patch mainbar")
+    (patch / "Resource" / "ext").mkdir()
+    (patch / "Resource" / "ext" / "skill.dnt").write_bytes(b"skill")
+
+    paks = []
+    for folder in (base, patch):
+        pak = EtFileSystem.write(f"{tmp_path}/{folder.name}.test.pak")
+        pak.add_files(str(folder))
+        pak.close_file_system()
+        paks.append(f"{tmp_path}/{folder.name}.test.pak")
+
+    return paks
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_override(tmp_path, use_mmap):
+    with PakVFS(create_paks(tmp_path), use_mmap=use_mmap) as vfs:
+        assert vfs.read("\\resource\\ui\\mainbar.ui") == b"patch mainbar"
+        assert vfs.read("/resource/ui/inven.ui") == b"base inven"
+        with vfs.open("\\RESOURCE\\EXT\\SKILL.DNT") as stream:
+            assert stream.read() == b"skill"
+
+        assert len(vfs.get_files()) == 4
+
+
+def test_exists(tmp_path):
+    with PakVFS(create_paks(tmp_path)) as vfs:
+        assert vfs.exists("\\readme.txt")
+        assert vfs.exists("resource/UI/MAINBAR.UI")
+        assert not vfs.exists("\\resource\\ui")
+        assert not vfs.exists("\\unavailable.txt")
+
+        with pytest.raises(FileNotFoundError):
+            vfs.read("\\unavailable.txt")
+
+
+def test_listdir(tmp_path):
+    with PakVFS(create_paks(tmp_path)) as vfs:
+        assert vfs.listdir() == ["readme.txt", "resource"]
+        assert vfs.listdir("\\resource\\") == ["ext", "ui"]
+        assert vfs.listdir("\\Resource\\UI") == ["inven.ui", "mainbar.ui"]
+
+        with pytest.raises(FileNotFoundError):
+            vfs.listdir("\\unavailable")